@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Render many song variations in parallel.
+
+Specs come from a JSON list (one object per song) or a JSON matrix whose list
+values are expanded as a cartesian product, for example:
+
+  [{"name": "slow", "bpm": 70, "seed": 1}, {"name": "long", "bars": 32}]
+  {"seed": [1, 2, 3], "bpm": [72, 84], "bars": [16]}
+
+Each spec renders to <out-dir>/<name>.wav; manifest.json records parameters,
+timing and levels for every file.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import numpy as np
+
+import music_gen as mg
+
+# Spec key -> music_gen module constant.
+SETTINGS = {
+    "bpm": "BPM",
+    "bars": "BARS",
+    "sr": "SR",
+    "progression": "PROGRESSION",
+    "bass_roots": "BASS_ROOTS",
+    "master_gain": "MASTER_GAIN",
+    "seed": "DRUM_SEED",
+}
+SPEC_KEYS = set(SETTINGS) | {"name"}
+DEFAULTS = {attr: getattr(mg, attr) for attr in SETTINGS.values()}
+# List nesting depth of a single value; one level deeper in a matrix means "sweep these".
+VALUE_DEPTH = {"progression": 2, "bass_roots": 1}
+
+
+def list_depth(value: Any) -> int:
+    depth = 0
+    while isinstance(value, list) and value:
+        depth += 1
+        value = value[0]
+    return depth
+
+
+def load_specs(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as handle:
+        raw = json.load(handle)
+    if isinstance(raw, dict):
+        axes = {}
+        for key, value in raw.items():
+            is_axis = list_depth(value) > VALUE_DEPTH.get(key, 0)
+            axes[key] = value if is_axis else [value]
+        keys = list(axes)
+        specs = [dict(zip(keys, combo)) for combo in itertools.product(*axes.values())]
+    elif isinstance(raw, list):
+        specs = raw
+    else:
+        raise ValueError("spec file must hold a JSON list of specs or a matrix object")
+
+    for idx, spec in enumerate(specs):
+        unknown = set(spec) - SPEC_KEYS
+        if unknown:
+            raise ValueError(f"spec {idx}: unknown keys {sorted(unknown)}")
+        if "name" not in spec:
+            parts = [f"{key}{spec[key]}" for key in ("seed", "bpm", "bars", "sr") if key in spec]
+            spec["name"] = f"{idx:03d}_" + "_".join(parts) if parts else f"{idx:03d}"
+    names = [spec["name"] for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError("spec names must be unique")
+    return specs
+
+
+def render_spec(spec: Dict[str, Any], out_dir: str) -> Dict[str, Any]:
+    # Workers are reused across specs, so reset every setting before applying overrides.
+    for key, attr in SETTINGS.items():
+        setattr(mg, attr, spec.get(key, DEFAULTS[attr]))
+
+    start = time.perf_counter()
+    audio = mg.render_song()
+    render_s = time.perf_counter() - start
+    path = os.path.join(out_dir, f"{spec['name']}.wav")
+    mg.write_wav(path, audio)
+
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if audio.size else 0.0
+    return {
+        "name": spec["name"],
+        "path": path,
+        "spec": spec,
+        "audio_seconds": len(audio) / mg.SR,
+        "render_seconds": render_s,
+        "total_seconds": time.perf_counter() - start,
+        "peak": peak,
+        "peak_dbfs": 20.0 * np.log10(peak) if peak > 0 else None,
+        "rms_dbfs": 20.0 * np.log10(rms) if rms > 0 else None,
+        "pid": os.getpid(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render song variations from a JSON spec list or matrix.")
+    parser.add_argument("specs", help="JSON file with a list of specs or a parameter matrix.")
+    parser.add_argument(
+        "--out-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "renders"),
+        help="Directory for WAV files and manifest.json.",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Concurrent render processes.")
+    args = parser.parse_args()
+
+    specs = load_specs(args.specs)
+    os.makedirs(args.out_dir, exist_ok=True)
+    started = time.perf_counter()
+    results: List[Dict[str, Any]] = [None] * len(specs)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(specs)))) as pool:
+        futures = {pool.submit(render_spec, spec, args.out_dir): idx for idx, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                results[idx] = future.result()
+                print(f"Rendered {results[idx]['path']} in {results[idx]['render_seconds']:.2f}s")
+            except Exception as exc:  # keep going; the manifest records the failure
+                failures += 1
+                results[idx] = {"name": specs[idx]["name"], "spec": specs[idx], "error": repr(exc)}
+                print(f"Failed {specs[idx]['name']}: {exc}", file=sys.stderr)
+
+    manifest = {
+        "workers": args.workers,
+        "wall_seconds": time.perf_counter() - started,
+        "renders": results,
+    }
+    manifest_path = os.path.join(args.out_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+    print(f"Manifest: {manifest_path} ({len(specs) - failures}/{len(specs)} ok, {manifest['wall_seconds']:.2f}s)")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""Benchmarks and memory profiling for music_gen.py.
+
+Subcommands:
+  sweep   time each render stage over a BARS x SR x density grid, record
+          tracemalloc and RSS peaks, write JSON/CSV and compare to a baseline
+  notes   loop vs batched render_notes as note count grows
+  memory  fail if render_song's tracemalloc peak exceeds a budget
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import music_gen as mg
+
+# "fx" always runs the effects buses, even though renders leave them off unless --fx is given.
+STAGES = ["build_events", "drums", "notes:chords", "notes:bass", "notes:melody", "notes:dense", "mix", "fx", "write_wav"]
+# Stage deltas smaller than these (or than a stage's spread across repeats)
+# are treated as noise when comparing to a baseline.
+MIN_TIME_DELTA_S = 0.005
+MIN_MEM_DELTA_B = 1 << 20
+MIN_BASELINE_REPEAT = 3  # a median of fewer runs is too noisy to gate on
+
+
+def dense_part(count: int, seed: int = 0) -> mg.Timeline:
+    # Quantized rhythms, like a real dense part: 16th/8th/quarter notes on a 16th grid.
+    rng = np.random.default_rng(seed)
+    step = int(60.0 / mg.BPM / 4.0 * mg.SR)
+    slots = int(mg.total_seconds() * mg.SR) // step - 4
+    return mg.Timeline.from_arrays(
+        rng.integers(0, slots, count) * step,
+        rng.choice(np.array([1, 2, 4]) * step, count),
+        rng.integers(48, 84, count),
+        0.3,
+    )
+
+
+def time_call(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+# -------------------------
+# Stage profiling
+# -------------------------
+
+class StageRecorder:
+    def __init__(self, trace: bool):
+        self.trace = trace
+        self.times: Dict[str, float] = {}
+        self.peaks: Dict[str, int] = {}
+        self.peak = 0  # whole-run tracemalloc peak, kept across the per-stage resets
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.trace:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+        if self.trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peak = max(self.peak, peak)
+            self.peaks[name] = max(self.peaks.get(name, 0), peak - base)
+
+
+def run_pipeline(rec: StageRecorder, density: int, wav_path: str):
+    mg.VOICE_CACHE.clear()
+    total_len = int(mg.total_seconds() * mg.SR)
+    with rec.stage("build_events"):
+        kick_times, snare_times, chords, bass = mg.build_events()
+        parts = mg.build_parts(chords, bass, mg.build_melody())
+        if density:
+            dense = dense_part(density * mg.BARS)
+            parts.append(mg.NoteTrack("dense", dense, "tri", 2200.0, (0.005, 0.03, 0.5, 0.05), 0.3, 0.2))
+    with rec.stage("drums"):
+        drums = mg.build_drums(kick_times, snare_times)
+
+    stems = []
+    for track in parts:
+        with rec.stage(f"notes:{track.name}"):
+            stems.append((track, mg.render_stem(track, np.zeros(total_len, dtype=np.float32))))
+
+    with rec.stage("fx"):
+        buses = mg.BusMixer(mg.build_buses(), total_len)
+    with rec.stage("mix"):
+        mix = np.zeros((total_len, 2), dtype=np.float32)
+        scratch = np.empty(total_len, dtype=np.float32)
+        for track in drums:
+            stems.append((track, mg.render_stem(track, np.zeros(total_len, dtype=np.float32))))
+        for track, stem in stems:
+            mg.add_panned(mix, stem, track.gain, track.pan, scratch)
+            buses.send(stem, track, scratch)
+        del stems, scratch
+    with rec.stage("fx"):
+        buses.mix_into(mix)
+        del buses
+    with rec.stage("mix"):
+        mg.master_mix(mix)
+
+    with rec.stage("write_wav"):
+        mg.write_wav(wav_path, mix)
+
+
+def profile_config(bars: int, sr: int, density: int, repeat: int) -> dict:
+    """Profile one grid point; runs in a fresh process so RSS and caches start clean."""
+    mg.BARS = bars
+    mg.SR = sr
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "bench.wav")
+        runs: Dict[str, List[float]] = {}
+        for _ in range(repeat):
+            rec = StageRecorder(trace=False)
+            run_pipeline(rec, density, wav_path)
+            for name, secs in rec.times.items():
+                runs.setdefault(name, []).append(secs)
+        tracemalloc.start()
+        traced = StageRecorder(trace=True)
+        run_pipeline(traced, density, wav_path)
+        traced_peak = max(traced.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    median = {name: float(np.median(secs)) for name, secs in runs.items()}
+    return {
+        "bars": bars,
+        "sr": sr,
+        "density": density,
+        "audio_seconds": mg.total_seconds(),
+        "repeat": repeat,
+        "total_s": sum(median.values()),
+        "stage_s": median,
+        "stage_spread_s": {name: max(secs) - min(secs) for name, secs in runs.items()},
+        "stage_tracemalloc_peak": traced.peaks,
+        "tracemalloc_peak": traced_peak,
+        "peak_rss": peak_rss_bytes(),
+    }
+
+
+def run_config_subprocess(bars: int, sr: int, density: int, repeat: int) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "_child", str(bars), str(sr), str(density), str(repeat)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+# -------------------------
+# Results and baselines
+# -------------------------
+
+def config_key(record: dict) -> tuple:
+    return (record["bars"], record["sr"], record["density"])
+
+
+def write_json(path: str, records: List[dict]):
+    payload = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": records,
+    }
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2)
+
+
+def write_csv(path: str, records: List[dict]):
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["bars", "sr", "density", "stage", "seconds", "tracemalloc_peak", "peak_rss"])
+        for record in records:
+            for stage, secs in record["stage_s"].items():
+                peak = record["stage_tracemalloc_peak"].get(stage, "")
+                writer.writerow([*config_key(record), stage, f"{secs:.6f}", peak, record["peak_rss"]])
+
+
+def spread_s(record: dict, stage: str) -> float:
+    # Baselines written before spreads were recorded count as noise-free.
+    return record.get("stage_spread_s", {}).get(stage, 0.0)
+
+
+def compare_to_baseline(records: List[dict], baseline_path: str, threshold: float) -> List[str]:
+    """Return one message per metric that regressed by more than `threshold` (a fraction)."""
+    with open(baseline_path, "r", encoding="utf-8") as handle:
+        baseline = {config_key(r): r for r in json.load(handle)["results"]}
+    regressions = []
+    for record in records:
+        old = baseline.get(config_key(record))
+        if old is None:
+            continue
+        label = "bars={} sr={} density={}".format(*config_key(record))
+        metrics = [
+            (
+                f"time {stage}",
+                secs,
+                old["stage_s"].get(stage),
+                max(MIN_TIME_DELTA_S, spread_s(record, stage), spread_s(old, stage)),
+            )
+            for stage, secs in record["stage_s"].items()
+        ]
+        metrics.append(("tracemalloc peak", record["tracemalloc_peak"], old.get("tracemalloc_peak"), MIN_MEM_DELTA_B))
+        metrics.append(("peak RSS", record["peak_rss"], old.get("peak_rss"), MIN_MEM_DELTA_B))
+        for name, new_value, old_value, min_delta in metrics:
+            if not old_value:
+                continue
+            if new_value > old_value * (1.0 + threshold) and new_value - old_value > min_delta:
+                regressions.append(f"{label}: {name} {old_value:.4g} -> {new_value:.4g} (+{new_value / old_value - 1.0:.0%})")
+    return regressions
+
+
+def print_record(record: dict):
+    print(
+        "bars={bars:<4} sr={sr:<6} density={density:<4} total {total_s:7.3f}s  "
+        "tracemalloc {tm:7.1f} MB  rss {rss:7.1f} MB".format(
+            tm=record["tracemalloc_peak"] / 1e6, rss=record["peak_rss"] / 1e6, **record
+        )
+    )
+    for stage in STAGES:
+        if stage in record["stage_s"]:
+            peak = record["stage_tracemalloc_peak"].get(stage, 0)
+            print(f"    {stage:<14} {record['stage_s'][stage]:8.4f}s  {peak / 1e6:7.1f} MB")
+
+
+def cmd_sweep(args) -> int:
+    records = []
+    for bars, sr, density in itertools.product(args.bars, args.sr, args.density):
+        record = run_config_subprocess(bars, sr, density, args.repeat)
+        print_record(record)
+        records.append(record)
+    if args.json:
+        write_json(args.json, records)
+    if args.csv:
+        write_csv(args.csv, records)
+    if args.baseline:
+        regressions = compare_to_baseline(records, args.baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+# -------------------------
+# Focused checks
+# -------------------------
+
+def unique_voices(events: mg.Timeline, env: Tuple[float, float, float, float]) -> int:
+    """Distinct (rendered length, held length, pitch) voices render_notes synthesizes for `events`."""
+    total_len = int(mg.total_seconds() * mg.SR)
+    ns = np.minimum(events.length + int(env[3] * mg.SR), total_len - events.start)
+    keep = ns > 0
+    return len(set(zip(ns[keep].tolist(), events.length[keep].tolist(), events.midi[keep].tolist())))
+
+
+def bench_render_notes(counts: List[int], repeat: int):
+    # No voice cache: every repeat synthesizes its voices, so "batched" measures batching and deduplication.
+    env = (0.005, 0.03, 0.5, 0.05)
+    print(f"{'notes':>8} {'voices':>8} {'loop (s)':>10} {'batched (s)':>12} {'speedup':>8}")
+    for count in counts:
+        events = dense_part(count)
+        loop = time_call(lambda: mg.render_notes(events, "tri", 1800.0, env, batched=False, cache=None), repeat)
+        batched = time_call(lambda: mg.render_notes(events, "tri", 1800.0, env, batched=True, cache=None), repeat)
+        voices = unique_voices(events, env)
+        print(f"{count:>8} {voices:>8} {loop:>10.3f} {batched:>12.3f} {loop / batched:>7.1f}x")
+
+
+def check_memory(budget: float) -> bool:
+    """Render the song under tracemalloc; peak must stay within budget x output size."""
+    mg.VOICE_CACHE.clear()
+    tracemalloc.start()
+    audio = mg.render_song()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    ratio = peak / audio.nbytes
+    ok = ratio <= budget
+    print(
+        f"render_song peak {peak / 1e6:.1f} MB for {audio.nbytes / 1e6:.1f} MB of audio "
+        f"({ratio:.2f}x, budget {budget:.2f}x): {'ok' if ok else 'OVER BUDGET'}"
+    )
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_child"]:
+        bars, sr, density, repeat = (int(v) for v in argv[1:5])
+        print(json.dumps(profile_config(bars, sr, density, repeat)))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Benchmark music_gen.py.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sweep = sub.add_parser("sweep", help="Profile render stages over a parameter grid.")
+    sweep.add_argument("--bars", type=int, nargs="+", default=[16, 64])
+    sweep.add_argument("--sr", type=int, nargs="+", default=[48000])
+    sweep.add_argument("--density", type=int, nargs="+", default=[0, 16], help="Extra dense-part notes per bar.")
+    sweep.add_argument("--repeat", type=int, default=3, help="Timed runs per grid point (the median is kept).")
+    sweep.add_argument("--json", help="Write results as JSON (usable as a baseline).")
+    sweep.add_argument("--csv", help="Write per-stage results as CSV.")
+    sweep.add_argument("--baseline", help="Compare against a JSON file from an earlier --json run.")
+    sweep.add_argument("--threshold", type=float, default=0.15, help="Allowed regression as a fraction.")
+
+    notes = sub.add_parser("notes", help="Loop vs batched render_notes scaling.")
+    notes.add_argument("--notes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    notes.add_argument("--repeat", type=int, default=3)
+
+    memory = sub.add_parser("memory", help="Check render_song peak memory against a budget.")
+    memory.add_argument("--budget", type=float, default=3.0, help="Allowed peak as a multiple of the output size.")
+
+    args = parser.parse_args(argv)
+    if args.command == "sweep" and args.baseline and args.repeat < MIN_BASELINE_REPEAT:
+        parser.error(f"--baseline needs --repeat {MIN_BASELINE_REPEAT} or more")
+    if args.command == "sweep":
+        return cmd_sweep(args)
+    if args.command == "notes":
+        bench_render_notes(args.notes, args.repeat)
+        return 0
+    return 0 if check_memory(args.budget) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
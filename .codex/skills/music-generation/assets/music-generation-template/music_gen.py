@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+import argparse
+import atexit
+import hashlib
+import json
 import math
 import os
-import wave
-from dataclasses import dataclass
-from typing import List, Tuple
+import queue
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
+from functools import lru_cache, wraps
+from multiprocessing import parent_process, shared_memory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 
@@ -17,8 +32,30 @@ BEATS_PER_BAR = 4
 BARS = 16
 SWING = 0.05  # subtle
 MASTER_GAIN = 0.9
+TARGET_PEAK = 0.89
+
+# Progression (lofi-ish), one chord per bar, repeating
+PROGRESSION = [
+    [57, 60, 64, 67],  # Am7
+    [52, 55, 59, 62],  # Em7
+    [50, 53, 57, 60],  # Dm7
+    [55, 59, 62, 65],  # G7
+]
+BASS_ROOTS = [45, 40, 38, 43]
 
 OUT_WAV = "lofi.wav"
+RENDER_CACHE_DIR = ".render_cache"  # incremental-render segment cache, next to this script
+RENDER_CACHE_VERSION = 1  # bump when synthesis changes so stale segments are ignored
+BLOCK_SIZE = 4096  # samples per block in streaming mode
+BATCH_MAX_SAMPLES = 1 << 18  # samples per 2-D note batch in render_notes
+VOICE_CACHE_BYTES = 64 * 1024 * 1024  # rendered-voice cache budget (0 disables)
+WAVETABLE_SIZE = 2048  # samples per wavetable cycle
+DRUM_BANK_DIR = ".drum_bank"  # persisted drum samples, next to this script
+DRUM_BANK_VERSION = 1  # bump when drum synthesis changes so stale samples are ignored
+DRUM_SEED = 1234
+DRUM_VARIANTS = 4  # round-robin variants per noisy drum kind
+FX_ENABLED = False  # reverb/delay buses (--fx); tracks' sends are ignored when off
+DRAFT_SR = 12000  # internal rate for --draft previews
 
 # -------------------------
 # Helpers
@@ -28,61 +65,295 @@ def midi_to_freq(m: float) -> float:
     return 440.0 * (2.0 ** ((m - 69.0) / 12.0))
 
 
-def clamp_array(x: np.ndarray, lo: float, hi: float) -> np.ndarray:
-    return np.minimum(np.maximum(x, lo), hi)
+def clamp_array(x: np.ndarray, lo: float, hi: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+    out = np.maximum(x, lo, out=out)
+    return np.minimum(out, hi, out=out)
+
+
+def soft_clip(x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    return np.tanh(x, out=out)
+
+
+# -------------------------
+# Tracing
+# -------------------------
+# Named spans around pipeline stages, recorded as Chrome trace-event JSON
+# (open in Perfetto or chrome://tracing) plus a per-stage summary. Enable with
+# --trace PATH or MUSIC_GEN_TRACE=PATH; add --trace-memory or
+# MUSIC_GEN_TRACE_MEMORY=1 for tracemalloc peaks per span. When tracing is off,
+# span() returns one shared no-op context manager and @traced adds a single
+# global check per call.
+
+_NO_SPAN = nullcontext()
+
+
+class Tracer:
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.events: List[dict] = []
+        self.summary: Dict[str, List[float]] = {}  # name -> [calls, seconds, peak bytes]
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def span(self, name: str, args: Optional[dict] = None):
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = None
+        if self.memory:
+            # Fold the peak so far into every open span before resetting it for this one.
+            current, peak = tracemalloc.get_traced_memory()
+            for open_frame in stack:
+                open_frame[1] = max(open_frame[1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, current]
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+            }
+            peak_bytes = 0
+            if frame is not None:
+                frame[1] = max(frame[1], tracemalloc.get_traced_memory()[1])
+                if stack and stack[-1] is not None:
+                    stack[-1][1] = max(stack[-1][1], frame[1])
+                peak_bytes = frame[1] - frame[0]
+                args = dict(args or {}, peak_bytes=peak_bytes)
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+                row = self.summary.setdefault(name, [0, 0.0, 0])
+                row[0] += 1
+                row[1] += end - start
+                row[2] = max(row[2], peak_bytes)
+
+    def write(self, path: str):
+        threads = {event["tid"] for event in self.events}
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": f"thread {i}"}}
+            for i, tid in enumerate(sorted(threads))
+        ]
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}, handle)
+
+    def format_summary(self) -> str:
+        lines = [f"{'stage':<28} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'peak MB':>8}"]
+        for name, (calls, secs, peak) in sorted(self.summary.items(), key=lambda item: -item[1][1]):
+            peak_col = f"{peak / 1e6:8.1f}" if self.memory else f"{'-':>8}"
+            lines.append(f"{name:<28} {calls:>7} {secs * 1e3:>10.1f} {secs * 1e3 / calls:>9.3f} {peak_col}")
+        return "\n".join(lines)
+
+
+TRACER: Optional[Tracer] = None
+
+
+def span(name: str, **args):
+    """Context manager timing one stage; free when tracing is off."""
+    if TRACER is None:
+        return _NO_SPAN
+    return TRACER.span(name, args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of span() named after the function."""
+
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            if TRACER is None:
+                return fn(*args, **kwargs)
+            with TRACER.span(label):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def start_tracing(memory: bool = False) -> Tracer:
+    global TRACER
+    TRACER = Tracer(memory)
+    return TRACER
+
+
+def finish_tracing(path: str):
+    """Write the trace to `path`, print the stage summary to stderr and stop tracing."""
+    global TRACER
+    tracer, TRACER = TRACER, None
+    if tracer is None:
+        return
+    tracer.write(path)
+    print(tracer.format_summary(), file=sys.stderr)
+    print(f"Trace: {path} (open in https://ui.perfetto.dev)", file=sys.stderr)
+
+
+if os.environ.get("MUSIC_GEN_TRACE") and parent_process() is None:  # not in pool workers
+    start_tracing(memory=os.environ.get("MUSIC_GEN_TRACE_MEMORY", "") not in ("", "0"))
+    atexit.register(finish_tracing, os.environ["MUSIC_GEN_TRACE"])
+
+
+# -------------------------
+# One-pole filter engine
+# -------------------------
+# Both filters reduce to the first-order recursion y[n] = a * y[n-1] + u[n].
+# Inside a block of m samples that recursion has the closed form
+#   y[k] = a^(k+1) * (y[-1] + cumsum(u / a^(j+1))[k])
+# so each block is a handful of NumPy calls instead of m interpreter steps.
+# Blocks are sized so a^-m stays far from float64 overflow. Each block is
+# evaluated in float64 and written to `out`, which may alias the input, so
+# float32 signals can be filtered in place.
+
+FILTER_BLOCK = 4096
+_SCAN_GROWTH_LOG = 230.0  # ln(1e100)
+
+
+def _one_pole_scan(u: np.ndarray, a: float, y_prev, scale: float = 1.0, out: Optional[np.ndarray] = None) -> np.ndarray:
+    # y[k] = a * y[k-1] + scale * u[k] along the last axis; y_prev is a scalar or one state per row.
+    if out is None:
+        out = np.empty(u.shape, dtype=np.float64)
+    n = u.shape[-1]
+    if n == 0:
+        return out
+    if a <= 0.0:
+        np.multiply(u, scale, out=out)
+        return out
+    block = int(min(FILTER_BLOCK, max(1.0, _SCAN_GROWTH_LOG / -math.log(a))))
+    powers = a ** np.arange(1, block + 1, dtype=np.float64)
+    weights = scale / powers
+    state = np.asarray(y_prev, dtype=np.float64)[..., None]
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        acc = u[..., start:end] * weights[: end - start]
+        np.cumsum(acc, axis=-1, out=acc)
+        acc += state
+        acc *= powers[: end - start]
+        out[..., start:end] = acc
+        state = acc[..., -1:]
+    return out
+
+
+def _filter_out(x: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    if out is not None:
+        return out
+    return np.empty(x.shape, dtype=x.dtype if x.dtype.kind == "f" else np.float64)
+
+
+class OnePoleLowpass:
+    """Stateful one-pole lowpass along the last axis; consecutive process() calls behave like one long signal."""
+
+    def __init__(self, cutoff: float):
+        rc = 1.0 / (2.0 * math.pi * cutoff)
+        dt = 1.0 / SR
+        self.alpha = dt / (rc + dt)
+        self.y_prev = None
 
+    def process(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        x = np.asarray(x)
+        out = _filter_out(x, out)
+        if x.shape[-1] == 0:
+            return out
+        if self.y_prev is None:
+            self.y_prev = x[..., 0].astype(np.float64)
+        _one_pole_scan(x, 1.0 - self.alpha, self.y_prev, scale=self.alpha, out=out)
+        self.y_prev = out[..., -1].astype(np.float64)
+        return out
 
-def soft_clip(x: np.ndarray) -> np.ndarray:
-    return np.tanh(x)
 
+class OnePoleHighpass:
+    """Stateful one-pole highpass along the last axis; consecutive process() calls behave like one long signal."""
 
-def one_pole_lowpass(x: np.ndarray, cutoff: float) -> np.ndarray:
+    def __init__(self, cutoff: float):
+        rc = 1.0 / (2.0 * math.pi * cutoff)
+        dt = 1.0 / SR
+        self.alpha = rc / (rc + dt)
+        self.y_prev = None
+        self.x_prev = 0.0
+
+    def process(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        x = np.asarray(x)
+        out = _filter_out(x, out)
+        if x.shape[-1] == 0:
+            return out
+        u = np.empty(x.shape, dtype=out.dtype)
+        u[..., 0] = x[..., 0] - self.x_prev
+        np.subtract(x[..., 1:], x[..., :-1], out=u[..., 1:])
+        x_last = x[..., -1].astype(np.float64)
+        if self.y_prev is None:
+            # First sample passes through unchanged (y[0] = x[0]).
+            first = x[..., 0].astype(np.float64)
+            out[..., 0] = first
+            _one_pole_scan(u[..., 1:], self.alpha, first, scale=self.alpha, out=out[..., 1:])
+        else:
+            _one_pole_scan(u, self.alpha, self.y_prev, scale=self.alpha, out=out)
+        self.y_prev = out[..., -1].astype(np.float64)
+        self.x_prev = x_last
+        return out
+
+
+def one_pole_lowpass(x: np.ndarray, cutoff: float, out: Optional[np.ndarray] = None) -> np.ndarray:
     if cutoff <= 0:
         return x
-    rc = 1.0 / (2.0 * math.pi * cutoff)
-    dt = 1.0 / SR
-    alpha = dt / (rc + dt)
-    y = np.zeros_like(x)
-    y[0] = x[0]
-    for i in range(1, len(x)):
-        y[i] = y[i - 1] + alpha * (x[i] - y[i - 1])
-    return y
+    return OnePoleLowpass(cutoff).process(x, out)
 
 
-def one_pole_highpass(x: np.ndarray, cutoff: float) -> np.ndarray:
+def one_pole_highpass(x: np.ndarray, cutoff: float, out: Optional[np.ndarray] = None) -> np.ndarray:
     if cutoff <= 0:
         return x
-    rc = 1.0 / (2.0 * math.pi * cutoff)
-    dt = 1.0 / SR
-    alpha = rc / (rc + dt)
-    y = np.zeros_like(x)
-    y[0] = x[0]
-    for i in range(1, len(x)):
-        y[i] = alpha * (y[i - 1] + x[i] - x[i - 1])
-    return y
+    return OnePoleHighpass(cutoff).process(x, out)
 
 
-def pan_stereo(sig: np.ndarray, pan: float) -> Tuple[np.ndarray, np.ndarray]:
+def pan_gains(pan: float) -> Tuple[float, float]:
     pan = max(-1.0, min(1.0, pan))
-    left = math.cos((pan + 1.0) * math.pi / 4.0)
-    right = math.sin((pan + 1.0) * math.pi / 4.0)
+    return math.cos((pan + 1.0) * math.pi / 4.0), math.sin((pan + 1.0) * math.pi / 4.0)
+
+
+def pan_stereo(sig: np.ndarray, pan: float) -> Tuple[np.ndarray, np.ndarray]:
+    left, right = pan_gains(pan)
     return sig * left, sig * right
 
 
+def add_panned(mix: np.ndarray, sig: np.ndarray, gain: float, pan: float, scratch: Optional[np.ndarray] = None):
+    """mix[:, 0/1] += sig * gain, panned, through one reusable scratch buffer."""
+    left, right = pan_gains(pan)
+    if scratch is None:
+        scratch = np.empty_like(sig)
+    np.multiply(sig, gain * left, out=scratch)
+    mix[:, 0] += scratch
+    np.multiply(sig, gain * right, out=scratch)
+    mix[:, 1] += scratch
+
+
 def env_exp(n: int, decay_s: float) -> np.ndarray:
-    t = np.arange(n) / SR
-    return np.exp(-t / decay_s)
+    t = np.arange(n, dtype=np.float32)
+    t *= -1.0 / (decay_s * SR)
+    return np.exp(t, out=t)
 
 
 def adsr_env(n: int, a: float, d: float, s: float, r: float, sustain_len_s: float) -> np.ndarray:
-    a_s = int(a * SR)
-    d_s = int(d * SR)
-    s_s = int(max(0.0, sustain_len_s) * SR)
-    r_s = int(r * SR)
+    return adsr_env_samples(n, int(a * SR), int(d * SR), s, int(max(0.0, sustain_len_s) * SR), int(r * SR))
+
+
+def adsr_env_samples(n: int, a_s: int, d_s: int, s: float, s_s: int, r_s: int) -> np.ndarray:
     total = a_s + d_s + s_s + r_s
+    env = np.zeros(max(total, n), dtype=np.float32)
     if total <= 0:
-        return np.zeros(n, dtype=np.float32)
-    env = np.zeros(total, dtype=np.float32)
+        return env[:n]
     if a_s > 0:
         env[:a_s] = np.linspace(0.0, 1.0, a_s, endpoint=False)
     if d_s > 0:
@@ -92,21 +363,264 @@ def adsr_env(n: int, a: float, d: float, s: float, r: float, sustain_len_s: floa
     if r_s > 0:
         start = a_s + d_s + s_s
         env[start:start + r_s] = np.linspace(s, 0.0, r_s, endpoint=True)
-    if total < n:
-        env = np.concatenate([env, np.zeros(n - total, dtype=np.float32)])
+    return env[:n]
+
+
+# -------------------------
+# WAV output
+# -------------------------
+# The RIFF header is written by hand and the data chunk is np.memmap'ed, so
+# float blocks are scaled, clipped and cast straight into the file mapping
+# through one block-sized scratch buffer instead of whole-mix int copies.
+
+WAV_FORMATS = {
+    # name: (format tag, bytes per sample)
+    "pcm16": (1, 2),
+    "pcm24": (1, 3),
+    "float32": (3, 4),
+}
+_WAV_GROW_FRAMES = 1 << 20  # growth step when the final length is unknown
+
+
+def _wav_header(frames: int, channels: int, sr: int, fmt: str) -> bytes:
+    tag, width = WAV_FORMATS[fmt]
+    block_align = channels * width
+    data_bytes = frames * block_align
+    fmt_chunk = struct.pack("<HHIIHH", tag, channels, sr, sr * block_align, block_align, width * 8)
+    extra = b""
+    if tag == 3:
+        # Non-PCM formats carry a cbSize field and a fact chunk with the frame count.
+        fmt_chunk += struct.pack("<H", 0)
+        extra = b"fact" + struct.pack("<II", 4, frames)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt_chunk)) + fmt_chunk + extra
+    body += b"data" + struct.pack("<I", data_bytes)
+    return b"RIFF" + struct.pack("<I", len(body) + data_bytes) + body
+
+
+def pcm_buffer(frames: int, channels: int, fmt: str) -> np.ndarray:
+    """Destination array for encode_pcm; its raw bytes are interleaved little-endian PCM."""
+    width = WAV_FORMATS[fmt][1]
+    if width == 3:
+        return np.empty((frames, channels, 3), dtype=np.uint8)
+    return np.empty((frames, channels), dtype=np.int16 if width == 2 else np.float32)
+
+
+def encode_pcm(block: np.ndarray, gain: float, fmt: str, dest: np.ndarray, scratch: np.ndarray):
+    """Scale, clip and cast a float (n, channels) block into `dest` (see pcm_buffer).
+
+    `scratch` is a float32 buffer of at least block.size elements; `block` is not modified.
+    """
+    scratch = scratch[:block.size].reshape(block.shape)
+    if fmt == "float32":
+        np.multiply(block, gain, out=scratch)
+        clamp_array(scratch, -1.0, 1.0, out=dest)
+    elif fmt == "pcm16":
+        np.multiply(block, gain * 32767.0, out=scratch)
+        clamp_array(scratch, -32767.0, 32767.0, out=scratch)
+        np.copyto(dest, scratch, casting="unsafe")
+    else:
+        np.multiply(block, gain * 8388607.0, out=scratch)
+        clamp_array(scratch, -8388607.0, 8388607.0, out=scratch)
+        # int32 has the same width as float32, so convert in place and keep the low 3 bytes.
+        as_int = scratch.view(np.int32)
+        np.copyto(as_int, scratch, casting="unsafe")
+        dest[...] = as_int.view(np.uint8).reshape(*block.shape, 4)[..., :3]
+
+
+class WavWriter:
+    """Write float audio into a memory-mapped WAV data chunk, block by block.
+
+    `frames` pre-sizes the file; if omitted (or exceeded) the mapping grows as
+    blocks arrive. close() trims the file and patches the header sizes.
+    """
+
+    def __init__(self, path: str, channels: int = 2, fmt: str = "pcm16", frames: int = 0, sr: Optional[int] = None):
+        if fmt not in WAV_FORMATS:
+            raise ValueError(f"unknown WAV format: {fmt} (expected one of {', '.join(WAV_FORMATS)})")
+        self.channels = channels
+        self.fmt = fmt
+        self.sr = SR if sr is None else sr
+        self.width = WAV_FORMATS[fmt][1]
+        self.header_size = len(_wav_header(0, channels, self.sr, fmt))
+        self.frames = 0
+        self._capacity = 0
+        self._map: Optional[np.ndarray] = None
+        self._scratch = np.empty(0, dtype=np.float32)
+        self._handle = open(path, "w+b")
+        self._handle.write(_wav_header(0, channels, self.sr, fmt))
+        self._reserve(frames)
+
+    def _reserve(self, frames: int):
+        if frames <= self._capacity:
+            return
+        self._release()
+        self._handle.truncate(self.header_size + frames * self.channels * self.width)
+        self._capacity = frames
+        if self.width == 3:
+            # 24-bit has no NumPy dtype: map raw bytes and fill 3 of every 4 int32 bytes.
+            dtype, shape = np.uint8, (frames, self.channels, 3)
+        else:
+            dtype, shape = (np.int16 if self.width == 2 else np.float32), (frames, self.channels)
+        self._map = np.memmap(self._handle, dtype=dtype, mode="r+", offset=self.header_size, shape=shape)
+
+    def _release(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+
+    def write(self, block: np.ndarray, gain: float = 1.0):
+        block = block.reshape(len(block), -1)
+        n = len(block)
+        if n == 0:
+            return
+        if self.frames + n > self._capacity:
+            self._reserve(max(self.frames + n, self._capacity + _WAV_GROW_FRAMES))
+        if self._scratch.size < block.size:
+            self._scratch = np.empty(block.size, dtype=np.float32)
+        with span("wav_encode"):
+            encode_pcm(block, gain, self.fmt, self._map[self.frames:self.frames + n], self._scratch)
+        self.frames += n
+
+    def close(self) -> int:
+        if self._handle.closed:
+            return self.frames
+        self._release()
+        self._handle.truncate(self.header_size + self.frames * self.channels * self.width)
+        self._handle.seek(0)
+        self._handle.write(_wav_header(self.frames, self.channels, self.sr, self.fmt))
+        self._handle.close()
+        return self.frames
+
+    def __enter__(self) -> "WavWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@traced()
+def write_wav(path: str, audio: np.ndarray, fmt: str = "pcm16", block_size: int = 1 << 16):
+    channels = audio.shape[1] if audio.ndim > 1 else 1
+    with WavWriter(path, channels, fmt, frames=len(audio)) as writer:
+        for start in range(0, len(audio), block_size):
+            writer.write(audio[start:start + block_size])
+
+
+def write_wav_blocks(
+    path: str,
+    blocks: Iterable[np.ndarray],
+    gain: float = 1.0,
+    fmt: str = "pcm16",
+    frames: int = 0,
+) -> int:
+    """Write stereo float blocks to a WAV as they arrive; returns frames written.
+
+    Pass the expected `frames` when known so the file is sized once up front.
+    """
+    with WavWriter(path, 2, fmt, frames=frames) as writer:
+        for block in blocks:
+            writer.write(block, gain)
+    return writer.frames
+
+# -------------------------
+# Oscillators
+# -------------------------
+# Phase is tracked in cycles: freq * t for a fixed pitch, or a running sum of
+# freq / SR for sweeps. Sine is evaluated directly (np.sin is cheaper than a
+# table gather in NumPy); tri/saw/square read band-limited wavetables with
+# linear interpolation, one table per octave so no harmonic crosses Nyquist.
+
+WAVEFORMS = ("sine", "tri", "saw", "square")
+_WAVETABLE_BASE_HZ = 20.0
+
+
+def _wavetable_levels(sr: int) -> int:
+    return max(1, int(math.ceil(math.log2((sr / 2.0) / _WAVETABLE_BASE_HZ))) + 1)
+
+
+@lru_cache(maxsize=None)
+def wavetables(wave: str, sr: int = SR, size: int = WAVETABLE_SIZE) -> np.ndarray:
+    """(levels, size + 1) band-limited tables; level k is safe up to BASE * 2**k Hz."""
+    levels = _wavetable_levels(sr)
+    tables = np.zeros((levels, size + 1), dtype=np.float64)
+    for level in range(levels):
+        top = _WAVETABLE_BASE_HZ * 2.0 ** level
+        max_h = max(1, min(size // 2 - 1, int((sr / 2.0) / top)))
+        h = np.arange(1, max_h + 1)
+        spectrum = np.zeros(size // 2 + 1, dtype=np.complex128)
+        # irfft maps X[h] = size/2 * (a - ib) to a*cos + b*sin for harmonic h.
+        if wave == "tri":
+            # Cosine-phase triangle: 1 at phase 0, -1 at phase 0.5.
+            odd = h[h % 2 == 1]
+            spectrum[odd] = (8.0 / math.pi ** 2) / odd ** 2
+        elif wave == "saw":
+            # Rising ramp from -1 to 1: -2/pi * sum(sin(h x) / h).
+            spectrum[h] = 1j * (2.0 / math.pi) / h
+        elif wave == "square":
+            odd = h[h % 2 == 1]
+            spectrum[odd] = -1j * (4.0 / math.pi) / odd
+        else:
+            spectrum[1] = -1j
+        spectrum *= size / 2.0
+        tables[level, :size] = np.fft.irfft(spectrum, n=size)
+        tables[level, size] = tables[level, 0]
+    tables = tables.astype(np.float32)
+    tables.setflags(write=False)
+    return tables
+
+
+def wavetable_level(freq):
+    ratio = np.maximum(np.abs(np.asarray(freq, dtype=np.float64)), 1e-9) / _WAVETABLE_BASE_HZ
+    level = np.ceil(np.log2(np.maximum(ratio, 1.0))).astype(np.intp)
+    return np.minimum(level, _wavetable_levels(SR) - 1)
+
+
+def osc_phase(freq, n: int) -> np.ndarray:
+    """Phase in cycles for n samples; freq is a scalar or a per-sample sweep."""
+    if np.ndim(freq) == 0:
+        return float(freq) * (np.arange(n) / SR)
+    return np.cumsum(np.asarray(freq, dtype=np.float64)[:n]) / SR
+
+
+@lru_cache(maxsize=None)
+def _wavetable_segments(wave: str, sr: int = SR) -> Tuple[np.ndarray, np.ndarray]:
+    # Flattened start values and slopes, so interpolation is two take() gathers.
+    tables = wavetables(wave, sr)
+    return tables[:, :-1].ravel(), np.diff(tables, axis=1).ravel()
+
+
+def osc_lookup(wave: str, cycles: np.ndarray, freq) -> np.ndarray:
+    """Evaluate `wave` at `cycles` (float64, consumed); rows of 2-D input use per-row freq.
+
+    Phase is reduced to [0, 1) in float64, then everything else runs in float32.
+    """
+    np.subtract(cycles, np.floor(cycles), out=cycles)
+    frac = cycles.astype(np.float32)
+    del cycles
+    if wave not in WAVEFORMS or wave == "sine":
+        frac *= 2 * math.pi
+        return np.sin(frac, out=frac)
+    base, slope = _wavetable_segments(wave, SR)
+    size = WAVETABLE_SIZE
+    if frac.ndim == 2:
+        offset = (wavetable_level(freq) * size)[:, None]
     else:
-        env = env[:n]
-    return env
+        # Sweeps use the band limit of their highest pitch.
+        offset = int(wavetable_level(np.max(np.abs(freq)))) * size
+    frac *= size
+    idx = frac.astype(np.intp)
+    frac -= idx
+    idx += offset
+    out = base.take(idx)
+    step = slope.take(idx)
+    step *= frac
+    out += step
+    return out
+
 
+def oscillator(wave: str, freq, n: int) -> np.ndarray:
+    return osc_lookup(wave, osc_phase(freq, n), freq)
 
-def write_wav(path: str, audio: np.ndarray):
-    audio = clamp_array(audio, -1.0, 1.0)
-    audio_i16 = (audio * 32767).astype(np.int16)
-    with wave.open(path, "wb") as wf:
-        wf.setnchannels(2)
-        wf.setsampwidth(2)
-        wf.setframerate(SR)
-        wf.writeframes(audio_i16.tobytes())
 
 # -------------------------
 # Drum synthesis (simple)
@@ -117,39 +631,127 @@ def make_kick() -> np.ndarray:
     t = np.arange(length) / SR
     f0, f1 = 110.0, 50.0
     freq = f0 * (f1 / f0) ** (t / 0.2)
-    phase = np.cumsum(freq) / SR
-    body = np.sin(2 * math.pi * phase)
-    env = env_exp(length, 0.18)
-    sig = body * env
-    sig = soft_clip(sig * 1.3)
-    return sig * 0.9
+    sig = oscillator("sine", freq, length)
+    sig *= env_exp(length, 0.18)
+    sig *= 1.3
+    soft_clip(sig, out=sig)
+    sig *= 0.9
+    return sig
 
 
-def make_snare() -> np.ndarray:
+def make_snare(rng: Optional[np.random.Generator] = None) -> np.ndarray:
     # Softer, warmer backbeat (less hissy)
     length = int(0.2 * SR)
-    t = np.arange(length) / SR
-    tone = np.sin(2 * math.pi * 220.0 * t) * env_exp(length, 0.07)
-    noise = np.random.uniform(-1, 1, length)
-    noise = one_pole_lowpass(noise, 2000.0)
-    noise = one_pole_highpass(noise, 300.0)
+    sig = oscillator("sine", 220.0, length)
+    sig *= env_exp(length, 0.07)
+    sig *= 0.7
+    noise = (rng or np.random).uniform(-1, 1, length).astype(np.float32)
+    one_pole_lowpass(noise, 2000.0, out=noise)
+    one_pole_highpass(noise, 300.0, out=noise)
     noise *= env_exp(length, 0.05)
-    sig = tone * 0.7 + noise * 0.3
-    sig = soft_clip(sig * 1.2)
-    return sig * 0.6
+    noise *= 0.3
+    sig += noise
+    sig *= 1.2
+    soft_clip(sig, out=sig)
+    sig *= 0.6
+    return sig
 
 
-def make_hat(open_hat: bool = False) -> np.ndarray:
+def make_hat(open_hat: bool = False, rng: Optional[np.random.Generator] = None) -> np.ndarray:
     length = int((0.18 if open_hat else 0.05) * SR)
-    noise = np.random.uniform(-1, 1, length)
-    env = env_exp(length, 0.07 if open_hat else 0.02)
-    sig = one_pole_highpass(noise, 5000.0) * env
-    return sig * 0.4
+    noise = (rng or np.random).uniform(-1, 1, length).astype(np.float32)
+    sig = one_pole_highpass(noise, 5000.0, out=noise)
+    sig *= env_exp(length, 0.07 if open_hat else 0.02)
+    sig *= 0.4
+    return sig
+
+# -------------------------
+# Drum sample bank
+# -------------------------
+# Drum hits are synthesized once per (kind, parameters, seed, variant, SR),
+# saved as .npy under DRUM_BANK_DIR and memory-mapped on later runs. Noisy
+# kinds get several seeded variants that tracks cycle through round-robin so
+# repeated hits don't sound identical.
+
+# kind: (synth function, keyword parameters, variants). Kinds with more than
+# one variant are noise-based and take a seeded `rng`.
+DRUM_KINDS = {
+    "kick": (make_kick, {}, 1),
+    "snare": (make_snare, {}, DRUM_VARIANTS),
+    "hat": (make_hat, {"open_hat": False}, DRUM_VARIANTS),
+    "open_hat": (make_hat, {"open_hat": True}, DRUM_VARIANTS),
+}
+
+
+class DrumBank:
+    """Seeded drum samples, persisted under `root` (None keeps them in memory only)."""
+
+    def __init__(self, root: Optional[str] = None, seed: int = DRUM_SEED):
+        self.root = root
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+        self._loaded: dict = {}
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+
+    def key(self, kind: str, variant: int) -> str:
+        params = {
+            "version": DRUM_BANK_VERSION,
+            "kind": kind,
+            "params": DRUM_KINDS[kind][1],
+            "seed": self.seed,
+            "variant": variant,
+            "sr": SR,
+        }
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def sample(self, kind: str, variant: int = 0) -> np.ndarray:
+        key = self.key(kind, variant)
+        sig = self._loaded.get(key)
+        if sig is not None:
+            return sig
+        path = None if self.root is None else os.path.join(self.root, f"{kind}-{key[:16]}.npy")
+        if path is not None:
+            try:
+                sig = np.load(path, mmap_mode="r")
+                self.hits += 1
+            except (OSError, ValueError):
+                sig = None
+        if sig is None:
+            self.misses += 1
+            synth, params, count = DRUM_KINDS[kind]
+            if count > 1:
+                # Seed from (bank seed, kind, variant) so each sample is reproducible on its own.
+                params = dict(params, rng=np.random.default_rng([self.seed, zlib.crc32(kind.encode("utf-8")), variant]))
+            with span("drum_synth", kind=kind, variant=variant):
+                sig = synth(**params).astype(np.float32, copy=False)
+            if path is not None:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as handle:
+                    np.save(handle, sig)
+                os.replace(tmp, path)
+        self._loaded[key] = sig
+        return sig
+
+    def variants(self, kind: str) -> List[np.ndarray]:
+        return [self.sample(kind, v) for v in range(DRUM_KINDS[kind][2])]
+
+
+_DRUM_BANK: Optional[DrumBank] = None
+
+
+def drum_bank() -> DrumBank:
+    """The workspace drum bank under DRUM_BANK_DIR for the current DRUM_SEED, created on first use."""
+    global _DRUM_BANK
+    if _DRUM_BANK is None or _DRUM_BANK.seed != DRUM_SEED:
+        _DRUM_BANK = DrumBank(os.path.join(os.path.dirname(os.path.abspath(__file__)), DRUM_BANK_DIR), DRUM_SEED)
+    return _DRUM_BANK
 
 # -------------------------
 # Music parts
 # -------------------------
-@dataclass
+@dataclass(slots=True)
 class NoteEvent:
     time_s: float
     dur_s: float
@@ -157,28 +759,291 @@ class NoteEvent:
     vel: float
 
 
-def render_notes(events: List[NoteEvent], osc: str, cutoff: float, env: Tuple[float, float, float, float]) -> np.ndarray:
-    total_len = int(total_seconds() * SR)
-    out = np.zeros(total_len, dtype=np.float32)
-    for ev in events:
-        n = int((ev.dur_s + env[3]) * SR)
-        start = int(ev.time_s * SR)
-        end = min(start + n, total_len)
-        if end <= start:
-            continue
-        t = np.arange(end - start) / SR
-        freq = midi_to_freq(ev.midi)
-        if osc == "sine":
-            sig = np.sin(2 * math.pi * freq * t)
-        elif osc == "tri":
-            sig = 2.0 * np.abs(2 * ((freq * t) % 1.0) - 1.0) - 1.0
+# -------------------------
+# Event timeline
+# -------------------------
+# Struct-of-arrays note storage: one structured NumPy array in sample units,
+# kept sorted by start so per-block lookups are a searchsorted away.
+
+EVENT_DTYPE = np.dtype([
+    ("start", np.int64),
+    ("length", np.int64),
+    ("midi", np.float32),
+    ("vel", np.float32),
+    ("track", np.int16),
+])
+
+
+class Timeline:
+    """Note events as a structured array sorted by start sample; transforms return new timelines."""
+
+    __slots__ = ("events",)
+
+    def __init__(self, events: Optional[np.ndarray] = None):
+        if events is None:
+            events = np.zeros(0, dtype=EVENT_DTYPE)
+        events = np.asarray(events, dtype=EVENT_DTYPE)
+        starts = events["start"]
+        if len(events) > 1 and np.any(starts[1:] < starts[:-1]):
+            events = events[np.argsort(starts, kind="stable")]
+        self.events = events
+
+    @classmethod
+    def from_arrays(cls, start, length, midi, vel, track=0) -> "Timeline":
+        start = np.asarray(start, dtype=np.int64)
+        events = np.zeros(start.shape[0], dtype=EVENT_DTYPE)
+        events["start"] = start
+        events["length"] = length
+        events["midi"] = midi
+        events["vel"] = vel
+        events["track"] = track
+        return cls(events)
+
+    @classmethod
+    def from_notes(cls, notes: List[NoteEvent], track: int = 0) -> "Timeline":
+        return cls.from_arrays(
+            [int(ev.time_s * SR) for ev in notes],
+            [note_samples(ev.dur_s) for ev in notes],
+            [ev.midi for ev in notes],
+            [ev.vel for ev in notes],
+            track,
+        )
+
+    @classmethod
+    def coerce(cls, events) -> "Timeline":
+        return events if isinstance(events, Timeline) else cls.from_notes(list(events))
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __getitem__(self, index: slice) -> "Timeline":
+        return Timeline(self.events[index])
+
+    @property
+    def start(self) -> np.ndarray:
+        return self.events["start"]
+
+    @property
+    def length(self) -> np.ndarray:
+        return self.events["length"]
+
+    @property
+    def midi(self) -> np.ndarray:
+        return self.events["midi"]
+
+    @property
+    def vel(self) -> np.ndarray:
+        return self.events["vel"]
+
+    @property
+    def track(self) -> np.ndarray:
+        return self.events["track"]
+
+    def shift(self, samples: int) -> "Timeline":
+        events = self.events.copy()
+        events["start"] += samples
+        return Timeline(events)
+
+    def with_track(self, track: int) -> "Timeline":
+        events = self.events.copy()
+        events["track"] = track
+        return Timeline(events)
+
+    def index_range(self, lo: int, hi: int) -> Tuple[int, int]:
+        """Index bounds of events starting in [lo, hi)."""
+        starts = self.events["start"]
+        return int(np.searchsorted(starts, lo, "left")), int(np.searchsorted(starts, hi, "left"))
+
+# -------------------------
+# Voices
+# -------------------------
+
+def note_samples(dur_s: float) -> int:
+    return int(max(0.0, dur_s) * SR)
+
+
+def voice_samples(length: int, env: Tuple[float, float, float, float]) -> int:
+    # Held length plus release tail.
+    return length + int(env[3] * SR)
+
+
+def _render_voice_batch(
+    freqs: np.ndarray,
+    n: int,
+    length: int,
+    osc: str,
+    cutoff: float,
+    env: Tuple[float, float, float, float],
+) -> np.ndarray:
+    # Unit-velocity voices, one row per pitch; every row shares n and the held length.
+    with span("oscillator", voices=len(freqs), samples=n):
+        sig = osc_lookup(osc, freqs[:, None] * (np.arange(n) / SR), freqs)
+        sig *= adsr_env_samples(n, int(env[0] * SR), int(env[1] * SR), env[2], length, int(env[3] * SR))
+    with span("filter", voices=len(freqs), samples=n):
+        return one_pole_lowpass(sig, cutoff, out=sig)
+
+
+def render_unit_voice(midi: float, length: int, n: int, osc: str, cutoff: float, env: Tuple[float, float, float, float]) -> np.ndarray:
+    return _render_voice_batch(np.array([midi_to_freq(midi)]), max(n, 0), length, osc, cutoff, env)[0]
+
+# -------------------------
+# Voice cache
+# -------------------------
+
+class VoiceCache:
+    """LRU cache of unit-velocity voices keyed by synthesis parameters, bounded by bytes.
+
+    Velocity is applied after the (linear) filter, so a cached voice scaled by
+    velocity is bit-identical to rendering the note from scratch.
+    """
+
+    def __init__(self, max_bytes: int = VOICE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        sig = self._entries.get(key)
+        if sig is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return sig
+
+    def put(self, key: tuple, sig: np.ndarray):
+        if sig.nbytes > self.max_bytes or key in self._entries:
+            return
+        sig = np.array(sig)
+        sig.setflags(write=False)
+        self._entries[key] = sig
+        self.bytes += sig.nbytes
+        while self.bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= old.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every voice and reset the hit/miss/eviction counters."""
+        self._entries.clear()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+VOICE_CACHE = VoiceCache()
+
+
+def voice_key(midi: float, n: int, length: int, osc: str, cutoff: float, env: Tuple[float, float, float, float]) -> tuple:
+    return (SR, osc, cutoff, tuple(env), n, length, midi)
+
+
+def cached_voice(
+    midi: float,
+    length: int,
+    vel: float,
+    osc: str,
+    cutoff: float,
+    env: Tuple[float, float, float, float],
+    max_len: Optional[int] = None,
+    cache: Optional[VoiceCache] = None,
+) -> np.ndarray:
+    """A velocity-scaled voice, served from `cache` when possible."""
+    n = voice_samples(length, env)
+    if max_len is not None:
+        n = min(n, max_len)
+    if cache is None or cache.max_bytes <= 0:
+        unit = render_unit_voice(midi, length, n, osc, cutoff, env)
+    else:
+        key = voice_key(midi, n, length, osc, cutoff, env)
+        unit = cache.get(key)
+        if unit is None:
+            unit = render_unit_voice(midi, length, n, osc, cutoff, env)
+            cache.put(key, unit)
+    return unit * vel
+
+
+def render_notes(
+    events,
+    osc: str,
+    cutoff: float,
+    env: Tuple[float, float, float, float],
+    batched: bool = True,
+    cache: Optional[VoiceCache] = VOICE_CACHE,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Render a Timeline (or a list of NoteEvent) into a mono float32 buffer."""
+    if out is None:
+        out = np.zeros(int(total_seconds() * SR), dtype=np.float32)
+    tl = Timeline.coerce(events)
+    total_len = len(out)
+    starts = tl.start
+    ns = np.minimum(tl.length + int(env[3] * SR), total_len - starts)
+    keep = ns > 0
+    if not keep.all():
+        tl = Timeline(tl.events[keep])
+        starts, ns = starts[keep], ns[keep]
+    if len(tl) == 0:
+        return out
+    if not batched:
+        for start, n, length, midi, vel in zip(
+            starts.tolist(), ns.tolist(), tl.length.tolist(), tl.midi.tolist(), tl.vel.tolist()
+        ):
+            out[start:start + n] += render_unit_voice(midi, length, n, osc, cutoff, env) * vel
+        return out
+
+    # Each distinct (rendered length, held length, pitch) is one voice.
+    keys = np.zeros(len(tl), dtype=[("n", np.int64), ("length", np.int64), ("midi", np.float32)])
+    keys["n"] = ns
+    keys["length"] = tl.length
+    keys["midi"] = tl.midi
+    voices, which = np.unique(keys, return_inverse=True)
+    which = which.ravel()
+
+    use_cache = cache is not None and cache.max_bytes > 0
+    units: List[Optional[np.ndarray]] = [None] * len(voices)
+    missing: dict = {}
+    for idx, (n, length, midi) in enumerate(voices.tolist()):
+        unit = cache.get(voice_key(midi, n, length, osc, cutoff, env)) if use_cache else None
+        if unit is None:
+            missing.setdefault((n, length), []).append((idx, midi))
         else:
-            sig = np.sin(2 * math.pi * freq * t)
-        env_arr = adsr_env(len(sig), env[0], env[1], env[2], env[3], ev.dur_s)
-        sig *= env_arr
-        sig = one_pole_lowpass(sig, cutoff)
-        sig *= ev.vel
-        out[start:end] += sig[: end - start]
+            units[idx] = unit
+
+    # Voices sharing both lengths share an envelope, so uncached pitches
+    # render as one 2-D array per group (chunked to bound memory).
+    for (n, length), group in missing.items():
+        rows_per_chunk = max(1, BATCH_MAX_SAMPLES // n)
+        for i in range(0, len(group), rows_per_chunk):
+            chunk = group[i:i + rows_per_chunk]
+            freqs = np.array([midi_to_freq(midi) for _, midi in chunk], dtype=np.float64)
+            rows = _render_voice_batch(freqs, n, length, osc, cutoff, env)
+            for (idx, midi), row in zip(chunk, rows):
+                units[idx] = row
+                if use_cache:
+                    cache.put(voice_key(midi, n, length, osc, cutoff, env), row)
+
+    # A slice add per note beats np.add.at/bincount scatters by a wide margin.
+    with span("note_scatter", notes=len(tl)):
+        scratch = np.empty(int(ns.max()), dtype=np.float32)
+        for start, n, idx, vel in zip(starts.tolist(), ns.tolist(), which.tolist(), tl.vel.tolist()):
+            np.multiply(units[idx], vel, out=scratch[:n])
+            out[start:start + n] += scratch[:n]
     return out
 
 
@@ -189,116 +1054,982 @@ def total_seconds() -> float:
 # Composition
 # -------------------------
 
-def build_events() -> Tuple[List[float], List[float], List[NoteEvent], List[NoteEvent]]:
-    # Drum triggers
-    kick_times: List[float] = []
-    snare_times: List[float] = []
+def bar_times(beats: List[float]) -> np.ndarray:
+    """(BARS, len(beats)) onset times in seconds of the given beats within every bar."""
+    base = np.arange(BARS) * BEATS_PER_BAR * 60.0 / BPM
+    return base[:, None] + np.array([beat * 60.0 / BPM for beat in beats])
 
-    # Music
-    chord_events: List[NoteEvent] = []
-    bass_events: List[NoteEvent] = []
 
-    # Progression (lofi-ish)
-    progression = [
-        [57, 60, 64, 67],  # Am7
-        [52, 55, 59, 62],  # Em7
-        [50, 53, 57, 60],  # Dm7
-        [55, 59, 62, 65],  # G7
-    ]
-    bass_roots = [45, 40, 38, 43]
+@traced()
+def build_events() -> Tuple[List[float], List[float], Timeline, Timeline]:
+    bars = np.arange(BARS)
 
-    for bar in range(BARS):
-        base = bar * BEATS_PER_BAR * 60.0 / BPM
-        idx = bar % 4
-        chord = progression[idx]
-        bass = bass_roots[idx]
+    # Drum triggers: kick on 1 and 3, snare on 2 and 4
+    kick_times = bar_times([0.0, 2.0]).ravel().tolist()
+    snare_times = bar_times([1.0, 3.0]).ravel().tolist()
 
-        # Kick on 1 and 3
-        kick_times.append(base + 0.0)
-        kick_times.append(base + 2.0 * 60.0 / BPM)
+    # Chords: sustained (whole note), lowest three notes of the bar's chord
+    chord_notes = np.array([chord[:3] for chord in PROGRESSION])[bars % len(PROGRESSION)]
+    chord_events = Timeline.from_arrays(
+        (np.repeat(bar_times([0.0]), 3, axis=1) * SR).astype(np.int64).ravel(),
+        note_samples(3.5 * 60.0 / BPM),
+        chord_notes.ravel(),
+        0.4,
+    )
 
-        # Snare on 2 and 4
-        snare_times.append(base + 1.0 * 60.0 / BPM)
-        snare_times.append(base + 3.0 * 60.0 / BPM)
+    # Bass: simple root + octave
+    roots = np.array(BASS_ROOTS)[bars % len(BASS_ROOTS)]
+    bass_events = Timeline.from_arrays(
+        (bar_times([0.5, 2.5]) * SR).astype(np.int64).ravel(),
+        note_samples(0.3),
+        np.stack([roots, roots + 12], axis=1).ravel(),
+        np.tile([0.6, 0.5], BARS),
+    )
 
-        # Chords: sustained (whole note)
-        for n in chord[:3]:
-            chord_events.append(NoteEvent(base, 3.5 * 60.0 / BPM, n, 0.4))
+    return kick_times, snare_times, chord_events, bass_events
 
-        # Bass: simple root + octave
-        bass_events.append(NoteEvent(base + 0.5 * 60.0 / BPM, 0.3, bass, 0.6))
-        bass_events.append(NoteEvent(base + 2.5 * 60.0 / BPM, 0.3, bass + 12, 0.5))
 
-    return kick_times, snare_times, chord_events, bass_events
+@traced()
+def build_melody() -> Timeline:
+    # Simple melody (soft sine): 2 notes per bar, gentle rhythm
+    scale = np.array([0, 3, 5, 7, 10])  # A minor pentatonic
+    steps = np.array([0, 2])
+    notes = 57 + 12 + scale[(np.arange(BARS)[:, None] + steps) % len(scale)]
+    return Timeline.from_arrays(
+        (bar_times(steps.tolist()) * SR).astype(np.int64).ravel(),
+        note_samples(0.6),
+        notes.ravel(),
+        0.35,
+    )
 
 # -------------------------
-# Render
+# Effects buses
 # -------------------------
+# Tracks feed named buses through per-stem send levels (post gain, pre pan,
+# so a bus input is one mono buffer). Each bus runs one stateful effect that
+# turns (n, 1) input blocks into (n, 2) returns, which are added to the mix
+# before glue. Effects keep their state between process() calls, so a song
+# rendered in one call or in streaming blocks of any size sounds the same.
 
-def render_song() -> np.ndarray:
-    total_len = int(total_seconds() * SR)
-    mix_l = np.zeros(total_len, dtype=np.float32)
-    mix_r = np.zeros(total_len, dtype=np.float32)
+FX_PARTITION = 4096  # reverb FFT partition size in samples
+
+
+def room_ir(decay_s: float = 1.6, predelay_s: float = 0.015, damp_hz: float = 5000.0, seed: int = 7) -> np.ndarray:
+    """Synthetic stereo room impulse response: damped, exponentially decaying noise (decay_s is RT60)."""
+    pre = int(predelay_s * SR)
+    n = int(decay_s * SR)
+    rng = np.random.default_rng(seed)
+    ir = np.zeros((pre + n, 2), dtype=np.float32)
+    tail = rng.standard_normal((2, n)).astype(np.float32)
+    one_pole_lowpass(tail, damp_hz, out=tail)
+    tail *= env_exp(n, decay_s / 6.9)  # -60 dB after decay_s
+    ir[pre:] = tail.T
+    ir /= np.sqrt(np.sum(np.square(ir, dtype=np.float64)) / 2.0)  # unit energy per channel
+    return ir
+
+
+class ConvolutionReverb:
+    """Uniformly partitioned overlap-add convolution with a (m, 2) impulse response.
+
+    The IR is cut into K partitions of P samples whose spectra are multiplied
+    against a delay line of the last K input-frame spectra, so each P-sample
+    frame costs one rfft, one irfft and K spectrum products. A partly filled
+    frame is convolved zero-padded and recomputed once it completes, which
+    keeps the output latency-free for any block size (the convolution is
+    causal, so samples already emitted never change).
+    """
+
+    def __init__(self, ir: np.ndarray, partition: int = FX_PARTITION):
+        ir = np.asarray(ir, dtype=np.float32).reshape(len(ir), -1)
+        self.p = p = partition
+        self.k = k = max(1, -(-len(ir) // p))
+        self.channels = ir.shape[1]
+        padded = np.zeros((k * p, self.channels), dtype=np.float32)
+        padded[:len(ir)] = ir
+        parts = np.zeros((k, 2 * p, self.channels), dtype=np.float32)
+        parts[:, :p] = padded.reshape(k, p, self.channels)
+        # Reversed so a chronological window of the delay line lines up with it.
+        self.spectra = np.fft.rfft(parts, axis=1)[::-1].copy()
+        self.reset()
+
+    def reset(self):
+        p, k = self.p, self.k
+        # Doubled ring: frame spectra are written at w and w + k, so the last k
+        # frames are always the contiguous slice [w + 1, w + k + 1).
+        self.fdl = np.zeros((2 * k, p + 1, self.channels), dtype=self.spectra.dtype)
+        self.w = 0
+        self.frame = np.zeros((2 * p, self.channels), dtype=np.float32)
+        self.fill = 0
+        self.overlap = np.zeros((p, self.channels), dtype=np.float32)
+        self.prod = np.empty_like(self.spectra)
+        self.acc = np.empty((p + 1, self.channels), dtype=self.spectra.dtype)
+
+    def process(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Convolve (n, 1) or (n, channels) input into out (n, channels); out must not alias x."""
+        out = np.empty((len(x), self.channels), dtype=np.float32) if out is None else out
+        p, k = self.p, self.k
+        pos = 0
+        while pos < len(x):
+            m = min(p - self.fill, len(x) - pos)
+            self.frame[self.fill:self.fill + m] = x[pos:pos + m]
+            spec = np.fft.rfft(self.frame, axis=0)
+            self.fdl[self.w] = spec
+            self.fdl[self.w + k] = spec
+            np.multiply(self.fdl[self.w + 1:self.w + k + 1], self.spectra, out=self.prod)
+            self.prod.sum(axis=0, out=self.acc)  # faster than einsum for these shapes
+            y = np.fft.irfft(self.acc, 2 * p, axis=0)
+            lo, hi = self.fill, self.fill + m
+            np.add(y[lo:hi], self.overlap[lo:hi], out=out[pos:pos + m])
+            self.fill = hi
+            if self.fill == p:
+                self.overlap[:] = y[p:]
+                self.frame[:p] = 0.0
+                self.fill = 0
+                self.w = (self.w + 1) % k
+            pos += m
+        return out
+
+
+class FeedbackDelay:
+    """Stereo feedback delay with a damped feedback path.
+
+    out[n] = line[n - D] with line[n] = x[n] + feedback * lowpass(out[n]).
+    Chunks of at most D samples only read line values written at least D
+    samples earlier, so each chunk is a few vector ops.
+    """
+
+    def __init__(self, time_s: float, feedback: float = 0.35, damp_hz: float = 3000.0):
+        self.d = max(1, int(time_s * SR))
+        self.feedback = feedback
+        self.damp_hz = damp_hz
+        self.reset()
+
+    def reset(self):
+        self.line = np.zeros((self.d, 2), dtype=np.float32)  # ring buffer, oldest sample at self.head
+        self.head = 0
+        self.damp = OnePoleLowpass(self.damp_hz)
+        self.fb = np.empty((self.d, 2), dtype=np.float32)
+
+    def process(self, x: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Delay (n, 1) or (n, 2) input into out (n, 2); out may alias a stereo x."""
+        out = np.empty((len(x), 2), dtype=np.float32) if out is None else out
+        pos = 0
+        while pos < len(x):
+            m = min(self.d - self.head, len(x) - pos)
+            seg = self.line[self.head:self.head + m]
+            fb = self.fb[:m]
+            self.damp.process(seg.T, out=fb.T)
+            fb *= self.feedback
+            fb += x[pos:pos + m]  # read before writing out, which may alias x
+            out[pos:pos + m] = seg
+            seg[...] = fb
+            self.head = (self.head + m) % self.d
+            pos += m
+        return out
+
+
+@dataclass
+class EffectBus:
+    name: str
+    effect: object  # reset() and process(x (n, 1), out (n, 2)) over float32 blocks
+    gain: float = 1.0  # return level into the mix
+
+
+def build_buses() -> List[EffectBus]:
+    return [
+        EffectBus("room", ConvolutionReverb(room_ir()), 0.8),
+        EffectBus("delay", FeedbackDelay(0.75 * 60.0 / BPM, feedback=0.35), 0.6),  # dotted eighth
+    ]
+
+
+class BusMixer:
+    """Accumulates mono track sends per bus and mixes the effect returns back in."""
+
+    def __init__(self, buses: List[EffectBus], n: int, block_size: int = 1 << 16):
+        self.buses = buses
+        self.inputs = {bus.name: np.zeros(n, dtype=np.float32) for bus in buses}
+        self.ret = np.empty((min(n, block_size), 2), dtype=np.float32)
+        for bus in buses:
+            bus.effect.reset()
+
+    def send(self, stem: np.ndarray, track, scratch: np.ndarray):
+        """Add a mono stem to the buses `track` sends to; stem may be shorter than the buffers."""
+        for name, level in track.sends.items():
+            if name in self.inputs and level:
+                np.multiply(stem, track.gain * level, out=scratch[:len(stem)])
+                self.inputs[name][:len(stem)] += scratch[:len(stem)]
+
+    def mix_into(self, mix: np.ndarray):
+        """Run each bus over its first len(mix) samples, add the returns to mix and clear the inputs."""
+        step = len(self.ret)
+        for bus in self.buses:
+            buf = self.inputs[bus.name]
+            with span(f"fx:{bus.name}"):
+                for start in range(0, len(mix), step):
+                    end = min(start + step, len(mix))
+                    ret = self.ret[:end - start]
+                    bus.effect.process(buf[start:end, None], out=ret)
+                    ret *= bus.gain
+                    mix[start:end] += ret
+            buf[:len(mix)] = 0.0
+
+# -------------------------
+# Song layout
+# -------------------------
+@dataclass
+class SampleTrack:
+    name: str
+    sample: np.ndarray
+    times: List[float]
+    gain: float
+    pan: float
+    variants: Tuple[np.ndarray, ...] = ()  # round-robin alternatives; `sample` when empty
+    hit_offset: int = 0  # round-robin position of times[0] (nonzero for time slices)
+    sends: Dict[str, float] = field(default_factory=dict)  # bus name -> send level
+
+    def hit_sample(self, i: int) -> np.ndarray:
+        if not self.variants:
+            return self.sample
+        return self.variants[(self.hit_offset + i) % len(self.variants)]
+
+
+@dataclass
+class NoteTrack:
+    name: str
+    events: Timeline
+    osc: str
+    cutoff: float
+    env: Tuple[float, float, float, float]
+    gain: float
+    pan: float
+    sends: Dict[str, float] = field(default_factory=dict)  # bus name -> send level
+
+
+@dataclass
+class Song:
+    total_len: int
+    drums: List[SampleTrack]
+    parts: List[NoteTrack]
+    buses: List[EffectBus] = field(default_factory=list)
+
+
+def sample_track(
+    name: str,
+    kind: str,
+    times: List[float],
+    gain: float,
+    pan: float,
+    bank: Optional[DrumBank] = None,
+    sends: Optional[Dict[str, float]] = None,
+) -> SampleTrack:
+    variants = (bank or drum_bank()).variants(kind)
+    return SampleTrack(name, variants[0], sorted(times), gain, pan, tuple(variants), sends=dict(sends or {}))
 
-    # Build events
+
+@traced()
+def build_drums(kick_times: List[float], snare_times: List[float], bank: Optional[DrumBank] = None) -> List[SampleTrack]:
+    return [
+        sample_track("kick", "kick", kick_times, 0.9, 0.0, bank),
+        sample_track("snare", "snare", snare_times, 0.5, 0.0, bank, sends={"room": 0.15}),
+    ]
+
+
+def build_parts(chords: Timeline, bass: Timeline, melody: Timeline) -> List[NoteTrack]:
+    return [
+        NoteTrack(
+            "chords", chords.with_track(0), "tri", 1800.0, (0.03, 0.12, 0.6, 0.3), 0.7, -0.1,
+            sends={"room": 0.3},
+        ),
+        NoteTrack("bass", bass.with_track(1), "sine", 200.0, (0.005, 0.05, 0.5, 0.08), 0.9, 0.0),
+        NoteTrack(
+            "melody", melody.with_track(2), "sine", 2600.0, (0.01, 0.08, 0.5, 0.2), 0.6, 0.1,
+            sends={"room": 0.35, "delay": 0.25},
+        ),
+    ]
+
+
+@traced()
+def build_song() -> Song:
     kick_times, snare_times, chords, bass = build_events()
+    drums = build_drums(kick_times, snare_times)
+    parts = build_parts(chords, bass, build_melody())
+    return Song(int(total_seconds() * SR), drums, parts, build_buses() if FX_ENABLED else [])
+
+# -------------------------
+# Resampling
+# -------------------------
+# Polyphase FIR: the zero-stuffed, up-sampled signal is never built. Outputs
+# come in frames of `up` consecutive samples; frame F reads one window of the
+# input starting at F * down, so all frames are a strided sliding-window view
+# times one small (window, up) matrix of filter phases, evaluated by BLAS.
 
-    # Drums
-    kick = make_kick()
-    snare = make_snare()
+RESAMPLE_TAPS = 16  # filter taps per polyphase branch
+RESAMPLE_BETA = 8.0  # Kaiser window shape (stopband ~ -80 dB)
 
-    def add_sample(sample: np.ndarray, time_s: float, gain: float, pan: float = 0.0):
-        start = int(time_s * SR)
+
+@lru_cache(maxsize=16)
+def resample_kernel(up: int, down: int, taps: int = RESAMPLE_TAPS) -> Tuple[np.ndarray, int]:
+    """(window, up) matrix mapping one input window to one output frame, and the window's input offset."""
+    n = taps * up
+    delay = (n - 1) // 2  # group delay in up-sampled samples, an integer so outputs stay aligned
+    cutoff = 0.5 / max(up, down)
+    h = np.zeros(n)
+    k = np.arange(2 * delay + 1) - delay
+    h[:2 * delay + 1] = up * 2.0 * cutoff * np.sinc(2.0 * cutoff * k) * np.kaiser(2 * delay + 1, RESAMPLE_BETA)
+    # Output F * up + r is sum_j h[p_r + up * j] * x[b_r + F * down - j].
+    t = np.arange(up) * down + delay
+    phase, base = t % up, t // up
+    lo = int(base.min()) - (taps - 1)
+    kernel = np.zeros((int(base.max()) - lo + 1, up), dtype=np.float32)
+    for r in range(up):
+        kernel[base[r] - np.arange(taps) - lo, r] = h[phase[r] + up * np.arange(taps)]
+    return kernel, lo
+
+
+@traced()
+def resample_poly(x: np.ndarray, up: int, down: int, chunk: int = 1 << 14) -> np.ndarray:
+    """Resample (n,) or (n, channels) float audio by up/down along axis 0."""
+    g = math.gcd(up, down)
+    up, down = up // g, down // g
+    x = np.asarray(x, dtype=np.float32)
+    if up == down:
+        return x.copy()
+    if not len(x):
+        return np.zeros(x.shape, dtype=np.float32)
+    kernel, lo = resample_kernel(up, down)
+    width = len(kernel)
+    chans = x.reshape(len(x), -1).T  # (channels, n)
+    m_total = -(-len(x) * up // down)
+    frames = -(-m_total // up)
+    front = -lo
+    padded = np.zeros((len(chans), max(front + len(x), (frames - 1) * down + width)), dtype=np.float32)
+    padded[:, front:front + len(x)] = chans
+    windows = np.lib.stride_tricks.sliding_window_view(padded, width, axis=1)[:, ::down][:, :frames]
+    out = np.empty((frames, up, len(chans)), dtype=np.float32)
+    for c in range(len(chans)):
+        for f in range(0, frames, chunk):
+            rows = np.ascontiguousarray(windows[c, f:f + chunk])
+            np.matmul(rows, kernel, out=out[f:f + len(rows), :, c])
+    return out.reshape(frames * up, -1)[:m_total].reshape((m_total,) + x.shape[1:])
+
+
+class _sample_rate:
+    """Temporarily run the synthesis graph at another SR."""
+
+    def __init__(self, sr: int):
+        self.sr = sr
+
+    def __enter__(self):
+        global SR
+        self.saved, SR = SR, self.sr
+
+    def __exit__(self, *exc):
+        global SR
+        SR = self.saved
+
+# -------------------------
+# Render
+# -------------------------
+
+def render_samples(track: SampleTrack, out: np.ndarray) -> np.ndarray:
+    total_len = len(out)
+    for i, t in enumerate(track.times):
+        sample = track.hit_sample(i)
+        start = int(t * SR)
         end = min(start + len(sample), total_len)
         if end <= start:
-            return
-        l, r = pan_stereo(sample[: end - start] * gain, pan)
-        mix_l[start:end] += l
-        mix_r[start:end] += r
-
-    for t in kick_times:
-        add_sample(kick, t, 0.9, 0.0)
-    for t in snare_times:
-        add_sample(snare, t, 0.5, 0.0)
-    # Music
-    chord_sig = render_notes(chords, osc="tri", cutoff=1800.0, env=(0.03, 0.12, 0.6, 0.3))
-    bass_sig = render_notes(bass, osc="sine", cutoff=200.0, env=(0.005, 0.05, 0.5, 0.08))
-
-    # Simple melody (soft sine)
-    melody_events: List[NoteEvent] = []
-    scale = [0, 3, 5, 7, 10]  # A minor pentatonic
-    for bar in range(BARS):
-        base = bar * BEATS_PER_BAR * 60.0 / BPM
-        # 2 notes per bar, gentle rhythm
-        for step, dur in [(0.0, 0.6), (2.0, 0.6)]:
-            note = 57 + 12 + scale[(bar + int(step)) % len(scale)]
-            melody_events.append(NoteEvent(base + step * 60.0 / BPM, dur, note, 0.35))
-    melody_sig = render_notes(melody_events, osc="sine", cutoff=2600.0, env=(0.01, 0.08, 0.5, 0.2))
-
-    # Mix music
-    chord_l, chord_r = pan_stereo(chord_sig * 0.7, -0.1)
-    bass_l, bass_r = pan_stereo(bass_sig * 0.9, 0.0)
-    mel_l, mel_r = pan_stereo(melody_sig * 0.6, 0.1)
-    mix_l += chord_l + bass_l + mel_l
-    mix_r += chord_r + bass_r + mel_r
-
-    # Gentle glue
-    mix_l = soft_clip(mix_l * 1.05)
-    mix_r = soft_clip(mix_r * 1.05)
-
-    mix = np.stack([mix_l, mix_r], axis=1)
+            continue
+        out[start:end] += sample[: end - start]
+    return out
+
+
+def render_stem(track, out: np.ndarray) -> np.ndarray:
+    """Render one track (before gain and pan) into the mono buffer `out`."""
+    with span(f"stem:{track.name}"):
+        if isinstance(track, SampleTrack):
+            return render_samples(track, out)
+        return render_notes(track.events, osc=track.osc, cutoff=track.cutoff, env=track.env, out=out)
+
+
+def glue(mix: np.ndarray) -> np.ndarray:
+    """Gentle soft-clip glue plus master gain, in place."""
+    mix *= 1.05
+    soft_clip(mix, out=mix)
     mix *= MASTER_GAIN
-    peak = np.max(np.abs(mix))
+    return mix
+
+
+@traced()
+def master_mix(mix: np.ndarray) -> np.ndarray:
+    """Glue and peak-normalize an (n, 2) mix in place."""
+    glue(mix)
+    peak = max(float(mix.max()), -float(mix.min())) if mix.size else 0.0
     if peak > 0:
-        mix *= (0.89 / peak)
+        mix *= (TARGET_PEAK / peak)
     return mix
 
 
-def main():
-    audio = render_song()
+@traced()
+def mix_song(song: Song) -> np.ndarray:
+    """All stems and effect returns summed to an (n, 2) float32 mix, before glue and normalization."""
+    mix = np.zeros((song.total_len, 2), dtype=np.float32)
+    stem = np.empty(song.total_len, dtype=np.float32)
+    scratch = np.empty(song.total_len, dtype=np.float32)
+    buses = BusMixer(song.buses, song.total_len)
+    for track in song.drums + song.parts:
+        stem.fill(0.0)
+        render_stem(track, stem)
+        add_panned(mix, stem, track.gain, track.pan, scratch)
+        buses.send(stem, track, scratch)
+    del stem, scratch
+    buses.mix_into(mix)
+    return mix
+
+
+@traced()
+def render_song(song: Optional[Song] = None) -> np.ndarray:
+    return master_mix(mix_song(build_song() if song is None else song))
+
+
+@traced()
+def render_song_draft(rate: Optional[int] = None) -> np.ndarray:
+    """Preview render: the whole graph runs at `rate`, then the mix is resampled to SR and mastered there."""
+    rate = DRAFT_SR if rate is None else rate
+    total_len = int(total_seconds() * SR)
+    if total_len == 0:
+        return np.zeros((0, 2), dtype=np.float32)
+    with _sample_rate(rate):
+        mix = mix_song(build_song())
+    mix = resample_poly(mix, SR, rate)
+    if len(mix) != total_len:
+        # Event times were rounded to the draft grid; match the full-rate length exactly.
+        fitted = np.zeros((total_len, 2), dtype=np.float32)
+        fitted[:min(total_len, len(mix))] = mix[:total_len]
+        mix = fitted
+    return master_mix(mix)
+
+# -------------------------
+# Parallel render
+# -------------------------
+
+def _split_track(track, slices: int) -> list:
+    # Contiguous time slices with roughly equal event counts.
+    if isinstance(track, SampleTrack):
+        times = sorted(track.times)
+        step = max(1, math.ceil(len(times) / slices))
+        return [
+            replace(track, times=times[i:i + step], hit_offset=track.hit_offset + i) for i in range(0, len(times), step)
+        ] or [track]
+    events = track.events
+    step = max(1, math.ceil(len(events) / slices))
+    return [replace(track, events=events[i:i + step]) for i in range(0, len(events), step)] or [track]
+
+
+def _render_stem_task(task: Tuple[str, Tuple[int, int], int, object]):
+    shm_name, shape, row, track = task
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        rows = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        render_stem(track, rows[row])
+        del rows
+    finally:
+        shm.close()
+
+
+@traced()
+def render_song_parallel(song: Optional[Song] = None, workers: Optional[int] = None, slices: int = 1) -> np.ndarray:
+    """render_song() with each stem (or time slice of a stem) rendered in a worker process.
+
+    Workers write into rows of one shared-memory buffer, so the main process
+    only sums, pans and masters; no audio is pickled back.
+    """
+    if song is None:
+        song = build_song()
+    tracks = song.drums + song.parts
+    tasks: List[Tuple[int, object]] = []
+    for stem_idx, track in enumerate(tracks):
+        tasks.extend((stem_idx, part) for part in _split_track(track, max(1, slices)))
+
+    shape = (len(tasks), song.total_len)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 4))
+    try:
+        rows = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        rows.fill(0.0)
+        with span("worker_stems", tasks=len(tasks)), ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_stem_task, [(shm.name, shape, i, part) for i, (_, part) in enumerate(tasks)]))
+
+        mix = np.zeros((song.total_len, 2), dtype=np.float32)
+        stem = np.empty(song.total_len, dtype=np.float32)
+        scratch = np.empty(song.total_len, dtype=np.float32)
+        buses = BusMixer(song.buses, song.total_len)
+        for stem_idx, track in enumerate(tracks):
+            stem.fill(0.0)
+            for row, (owner, _) in zip(rows, tasks):
+                if owner == stem_idx:
+                    stem += row
+            add_panned(mix, stem, track.gain, track.pan, scratch)
+            buses.send(stem, track, scratch)
+        del rows, stem, scratch
+        buses.mix_into(mix)
+        del buses
+    finally:
+        shm.close()
+        shm.unlink()
+    return master_mix(mix)
+
+# -------------------------
+# Incremental render
+# -------------------------
+# Note stems are split at bar lines. Each (stem, bar) segment is hashed from
+# its bar-relative events and synthesis parameters and its rendered audio is
+# kept as .npy under RENDER_CACHE_DIR, so editing one note re-renders one
+# segment. Identical bars (a repeating progression) share a file. Gain and pan
+# are applied at mix time, so mix tweaks never invalidate segments. Drum
+# triggers are plain slice adds and are not worth caching.
+
+class SegmentCache:
+    """On-disk cache of rendered segments keyed by content hash."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".npy")
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        try:
+            sig = np.load(self._path(key))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return sig
+
+    def store(self, key: str, sig: np.ndarray):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as handle:
+            np.save(handle, sig)
+        os.replace(tmp, path)
+
+
+def segment_cache() -> SegmentCache:
+    """The workspace segment cache under RENDER_CACHE_DIR."""
+    return SegmentCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), RENDER_CACHE_DIR))
+
+
+def _bar_starts(total_len: int) -> List[int]:
+    bar_s = BEATS_PER_BAR * 60.0 / BPM
+    starts = [int(bar * bar_s * SR) for bar in range(BARS)]
+    return [s for s in starts if s < total_len] + [total_len]
+
+
+def segment_key(track: NoteTrack, events: np.ndarray, clip_len: int) -> str:
+    digest = hashlib.sha256()
+    params = {
+        "version": RENDER_CACHE_VERSION,
+        "sr": SR,
+        "osc": track.osc,
+        "cutoff": track.cutoff,
+        "env": list(track.env),
+        "clip": clip_len,
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    rel = np.ascontiguousarray(events[["start", "length", "midi", "vel"]])
+    digest.update(rel.tobytes())
+    return digest.hexdigest()
+
+
+def render_note_stem_incremental(track: NoteTrack, out: np.ndarray, cache: SegmentCache) -> np.ndarray:
+    total_len = len(out)
+    tl = track.events
+    release = int(track.env[3] * SR)
+    bounds = _bar_starts(total_len)
+    for bar_start, bar_end in zip(bounds[:-1], bounds[1:]):
+        i0, i1 = tl.index_range(bar_start, bar_end)
+        if i0 == i1:
+            continue
+        seg = tl[i0:i1].shift(-bar_start)
+        clip_len = min(int((seg.start + seg.length).max()) + release, total_len - bar_start)
+        key = segment_key(track, seg.events, clip_len)
+        audio = cache.load(key)
+        if audio is None:
+            audio = render_notes(seg, track.osc, track.cutoff, track.env, out=np.zeros(clip_len, dtype=np.float32))
+            cache.store(key, audio)
+        out[bar_start:bar_start + len(audio)] += audio
+    return out
+
+
+@traced()
+def render_song_incremental(song: Optional[Song] = None, cache: Optional[SegmentCache] = None) -> np.ndarray:
+    """render_song() reusing cached bar segments; only changed segments are synthesized.
+
+    Pass `cache` to read its hit and miss counts afterwards.
+    """
+    if song is None:
+        song = build_song()
+    if cache is None:
+        cache = segment_cache()
+    mix = np.zeros((song.total_len, 2), dtype=np.float32)
+    stem = np.empty(song.total_len, dtype=np.float32)
+    scratch = np.empty(song.total_len, dtype=np.float32)
+    buses = BusMixer(song.buses, song.total_len)
+    for track in song.drums + song.parts:
+        stem.fill(0.0)
+        if isinstance(track, NoteTrack):
+            with span(f"stem:{track.name}"):
+                render_note_stem_incremental(track, stem, cache)
+        else:
+            render_stem(track, stem)
+        add_panned(mix, stem, track.gain, track.pan, scratch)
+        buses.send(stem, track, scratch)
+    del stem, scratch
+    buses.mix_into(mix)
+    del buses
+    return master_mix(mix)
+
+# -------------------------
+# Streaming render
+# -------------------------
+
+class _StemStream:
+    """Mixes one stem into consecutive blocks, carrying voice tails across block edges."""
+
+    def __init__(self, starts: np.ndarray, render: Callable[[int, int], np.ndarray], total_len: int):
+        starts = np.asarray(starts, dtype=np.int64)
+        self.order = np.argsort(starts, kind="stable")
+        self.starts = starts[self.order]
+        self.render = render
+        self.total_len = total_len
+        self.next_idx = 0
+        self.active: List[Tuple[int, np.ndarray]] = []
+
+    def mix_into(self, out: np.ndarray, block_start: int):
+        block_end = block_start + len(out)
+        stop = int(np.searchsorted(self.starts, min(block_end, self.total_len), "left"))
+        for i in range(self.next_idx, stop):
+            start = int(self.starts[i])
+            sig = self.render(int(self.order[i]), self.total_len - start)
+            if len(sig):
+                self.active.append((start, sig))
+        self.next_idx = max(self.next_idx, stop)
+        still_active: List[Tuple[int, np.ndarray]] = []
+        for start, sig in self.active:
+            lo = max(start, block_start)
+            hi = min(start + len(sig), block_end)
+            if hi > lo:
+                out[lo - block_start:hi - block_start] += sig[lo - start:hi - start]
+            if start + len(sig) > block_end:
+                still_active.append((start, sig))
+        self.active = still_active
+
+
+def _sample_stream(track: SampleTrack, total_len: int) -> _StemStream:
+    starts = np.array([int(t * SR) for t in track.times], dtype=np.int64)
+    return _StemStream(starts, lambda i, max_len: track.hit_sample(i)[:max_len], total_len)
+
+
+def _note_stream(track: NoteTrack, total_len: int) -> _StemStream:
+    tl = track.events
+    lengths, midis, vels = tl.length, tl.midi, tl.vel
+
+    def render(i: int, max_len: int) -> np.ndarray:
+        return cached_voice(
+            float(midis[i]), int(lengths[i]), float(vels[i]), track.osc, track.cutoff, track.env, max_len, VOICE_CACHE
+        )
+
+    return _StemStream(tl.start, render, total_len)
+
+
+def stream_song(song: Song, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """Yield the mastered (pre-normalization) mix as float32 (n, 2) blocks."""
+    stems = [(_sample_stream(t, song.total_len), t) for t in song.drums]
+    stems += [(_note_stream(t, song.total_len), t) for t in song.parts]
+    mono = np.zeros(block_size, dtype=np.float32)
+    scratch = np.empty(block_size, dtype=np.float32)
+    buses = BusMixer(song.buses, block_size)
+    for block_start in range(0, song.total_len, block_size):
+        n = min(block_size, song.total_len - block_start)
+        with span("stream_block"):
+            block = np.zeros((n, 2), dtype=np.float32)
+            for stream, track in stems:
+                stem = mono[:n]
+                stem.fill(0.0)
+                stream.mix_into(stem, block_start)
+                add_panned(block, stem, track.gain, track.pan, scratch[:n])
+                buses.send(stem, track, scratch[:n])
+            buses.mix_into(block)
+            glue(block)
+        yield block
+
+
+def render_song_to_wav(path: str, block_size: int = BLOCK_SIZE, normalize: str = "two-pass", fmt: str = "pcm16") -> int:
+    """Render straight to disk in O(block_size) memory.
+
+    "two-pass" renders once to find the peak and again to write, matching
+    render_song(); "none" writes in a single pass and relies on soft_clip and
+    MASTER_GAIN for headroom.
+    """
+    song = build_song()
+    gain = 1.0
+    if normalize == "two-pass":
+        peak = 0.0
+        for block in stream_song(song, block_size):
+            peak = max(peak, float(np.max(np.abs(block))))
+        if peak > 0:
+            gain = TARGET_PEAK / peak
+    elif normalize != "none":
+        raise ValueError(f"unknown normalize mode: {normalize}")
+    return write_wav_blocks(path, stream_song(song, block_size), gain, fmt, frames=song.total_len)
+
+
+# Sample formats as named by aplay (-f) and ffmpeg (-f) for raw PCM input.
+RAW_FORMAT_NAMES = {
+    "pcm16": ("S16_LE", "s16le"),
+    "pcm24": ("S24_3LE", "s24le"),
+    "float32": ("FLOAT_LE", "f32le"),
+}
+
+
+@dataclass
+class StreamStats:
+    frames: int = 0
+    blocks: int = 0
+    first_block_s: float = 0.0
+    elapsed_s: float = 0.0
+    max_queue: int = 0
+
+    @property
+    def realtime_factor(self) -> float:
+        return (self.frames / SR) / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def stream_pcm(
+    sink,
+    block_size: int = BLOCK_SIZE,
+    fmt: str = "pcm16",
+    queue_blocks: int = 8,
+    gain: float = 1.0,
+    song: Optional[Song] = None,
+    report: Optional[Callable[[StreamStats], None]] = None,
+    report_every_s: float = 2.0,
+) -> StreamStats:
+    """Write interleaved little-endian PCM to a binary file object as blocks render.
+
+    A render thread runs at most `queue_blocks` blocks ahead of the writer, so
+    a slow sink (aplay at real time, a network pipe) bounds memory instead of
+    letting the whole song pile up. Output is single-pass: no peak
+    normalization beyond `gain`, MASTER_GAIN and the soft clipper.
+    """
+    song = build_song() if song is None else song
+    blocks: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=max(1, queue_blocks))
+    stop = threading.Event()
+    failure: List[BaseException] = []
+
+    def produce():
+        try:
+            for block in stream_song(song, block_size):
+                while not stop.is_set():
+                    try:
+                        blocks.put(block, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except BaseException as exc:  # surfaced to the caller after the writer drains
+            failure.append(exc)
+        finally:
+            blocks.put(None)
+
+    stats = StreamStats()
+    dest = pcm_buffer(block_size, 2, fmt)
+    scratch = np.empty(block_size * 2, dtype=np.float32)
+    start = time.perf_counter()
+    last_report = start
+    producer = threading.Thread(target=produce, name="music-gen-render", daemon=True)
+    producer.start()
+    try:
+        while True:
+            stats.max_queue = max(stats.max_queue, blocks.qsize())
+            block = blocks.get()
+            if block is None:
+                break
+            n = len(block)
+            encode_pcm(block, gain, fmt, dest[:n], scratch)
+            sink.write(memoryview(dest[:n]).cast("B"))
+            sink.flush()
+            stats.frames += n
+            stats.blocks += 1
+            now = time.perf_counter()
+            if stats.blocks == 1:
+                stats.first_block_s = now - start
+            if report is not None and now - last_report >= report_every_s:
+                stats.elapsed_s = now - start
+                report(stats)
+                last_report = now
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue, then let it finish.
+        while producer.is_alive():
+            try:
+                blocks.get_nowait()
+            except queue.Empty:
+                pass
+            producer.join(timeout=0.05)
+    stats.elapsed_s = time.perf_counter() - start
+    if failure:
+        raise failure[0]
+    return stats
+
+
+def format_stream_stats(stats: StreamStats) -> str:
+    return (
+        f"{stats.frames / SR:.1f}s audio in {stats.elapsed_s:.2f}s "
+        f"({stats.realtime_factor:.1f}x real time), first block after {stats.first_block_s * 1000:.1f} ms, "
+        f"render-ahead peak {stats.max_queue} blocks"
+    )
+
+
+def run_raw_stream(args):
+    aplay_fmt, ffmpeg_fmt = RAW_FORMAT_NAMES[args.format]
+    print(
+        f"Streaming raw PCM: {SR} Hz, 2 channels, {args.format} "
+        f"(read with `aplay -f {aplay_fmt} -c 2 -r {SR}` or `ffmpeg -f {ffmpeg_fmt} -ar {SR} -ac 2 -i -`)",
+        file=sys.stderr,
+    )
+
+    def report(stats: StreamStats):
+        print(f"  {format_stream_stats(stats)}", file=sys.stderr)
+
+    sink = sys.stdout.buffer if args.raw == "-" else open(args.raw, "wb")
+    try:
+        stats = stream_pcm(sink, args.block_size, args.format, args.queue_blocks, report=report)
+    except BrokenPipeError:
+        # The reader went away (player closed, `head` satisfied); stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sink.fileno())
+        print("Sink closed; stopped streaming.", file=sys.stderr)
+        return
+    finally:
+        if sink is not sys.stdout.buffer:
+            sink.close()
+    print(f"Streamed: {format_stream_stats(stats)}", file=sys.stderr)
+
+
+def run_render(args):
     out_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), OUT_WAV)
-    write_wav(out_path, audio)
+    segments = None
+    if args.stream:
+        render_song_to_wav(out_path, args.block_size, args.normalize, args.format)
+    elif args.incremental:
+        segments = segment_cache()
+        audio = render_song_incremental(cache=segments)
+        write_wav(out_path, audio, args.format)
+    elif args.workers > 0:
+        audio = render_song_parallel(workers=args.workers, slices=args.slices)
+        write_wav(out_path, audio, args.format)
+    elif args.draft:
+        audio = render_song_draft(args.draft)
+        write_wav(out_path, audio, args.format)
+    else:
+        audio = render_song()
+        write_wav(out_path, audio, args.format)
     print(f"Rendered: {out_path}")
+    stats = VOICE_CACHE.stats()
+    if stats["hits"] or stats["misses"]:
+        print(
+            f"Voice cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['entries']} voices, {stats['bytes'] / (1024 * 1024):.1f} MB"
+        )
+    if segments is not None:
+        print(f"Segment cache: {segments.hits} reused, {segments.misses} rendered")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a procedural lofi track to WAV.")
+    parser.add_argument("--stream", action="store_true", help="Render block by block straight to disk.")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Samples per block in streaming mode.")
+    parser.add_argument(
+        "--normalize",
+        choices=["two-pass", "none"],
+        default="two-pass",
+        help="Peak normalization strategy in streaming mode.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(WAV_FORMATS),
+        default="pcm16",
+        help="WAV sample format.",
+    )
+    parser.add_argument(
+        "--voice-cache-mb",
+        type=float,
+        default=VOICE_CACHE_BYTES / (1024 * 1024),
+        help="Memory budget for the rendered-voice cache (0 disables).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Render stems in this many worker processes (0 renders serially).",
+    )
+    parser.add_argument("--slices", type=int, default=1, help="Time slices per stem in parallel mode.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"Reuse rendered bar segments cached under {RENDER_CACHE_DIR}/.",
+    )
+    parser.add_argument("--fx", action="store_true", help="Add the reverb and delay buses (slower).")
+    parser.add_argument(
+        "--draft",
+        type=int,
+        nargs="?",
+        const=DRAFT_SR,
+        metavar="RATE",
+        help=f"Quick preview: synthesize at RATE Hz (default {DRAFT_SR}) and resample to {SR} Hz.",
+    )
+    parser.add_argument(
+        "--raw",
+        metavar="PATH",
+        help="Stream headerless interleaved PCM to PATH ('-' for stdout, or a FIFO) as blocks render.",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace-event JSON of pipeline stages to PATH (also MUSIC_GEN_TRACE=PATH).",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Record tracemalloc peaks per span (slower; also MUSIC_GEN_TRACE_MEMORY=1).",
+    )
+    parser.add_argument(
+        "--queue-blocks",
+        type=int,
+        default=8,
+        help="Blocks the renderer may run ahead of a --raw sink.",
+    )
+    args = parser.parse_args()
+    VOICE_CACHE.max_bytes = int(args.voice_cache_mb * 1024 * 1024)
+    global FX_ENABLED
+    FX_ENABLED = args.fx
+    if args.draft and (args.stream or args.raw or args.incremental or args.workers > 0):
+        parser.error("--draft renders in memory and cannot be combined with --stream, --raw, --incremental or --workers")
+
+    if args.trace:
+        start_tracing(args.trace_memory)
+    try:
+        if args.raw:
+            run_raw_stream(args)
+        else:
+            run_render(args)
+    finally:
+        if args.trace:
+            finish_tracing(args.trace)
 
 
 if __name__ == "__main__":
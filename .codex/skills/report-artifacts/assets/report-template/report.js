@@ -8,6 +8,18 @@ const tableRoot = document.getElementById("table");
 const notesRoot = document.getElementById("notes");
 
 const palette = ["#4cc3ff", "#b44bff", "#ff4fd8", "#2ee6c7", "#6aa9ff"];
+// Chunked tables keep rows in the DOM only within this distance (px) of the viewport.
+const TABLE_WINDOW_MARGIN = 800;
+
+// Sidecar chunk scripts call reportChunk(key, index, rows) when they load.
+const chunkWaiters = new Map();
+window.reportChunk = (key, index, rows) => {
+  const resolve = chunkWaiters.get(`${key}-${index}`);
+  if (resolve) {
+    chunkWaiters.delete(`${key}-${index}`);
+    resolve(rows);
+  }
+};
 
 function createMetric(metric) {
   const card = document.createElement("div");
@@ -41,6 +53,29 @@ function renderMetrics() {
   metrics.forEach((metric) => metricsRoot.appendChild(createMetric(metric)));
 }
 
+function nearestPoint(positions, value) {
+  let low = 0;
+  let high = positions.length - 1;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (positions[mid] < value) {
+      low = mid + 1;
+    } else {
+      high = mid;
+    }
+  }
+  return low > 0 && value - positions[low - 1] < positions[low] - value ? low - 1 : low;
+}
+
+function positionScale(positions) {
+  return { type: "linear", min: positions[0], max: positions[positions.length - 1] };
+}
+
+function positionTicks(positions, labels) {
+  // Linear ticks fall between kept points; label each with its nearest point.
+  return { callback: (value) => String(labels[nearestPoint(positions, value)] ?? "") };
+}
+
 function renderCharts() {
   if (!chartsRoot) {
     return;
@@ -64,11 +99,15 @@ function renderCharts() {
     card.append(title, canvas);
     chartsRoot.appendChild(card);
 
+    // Downsampled charts carry each point's index in the full series as `x`;
+    // plot them on a linear axis so the spacing between kept points survives.
+    const positions = Array.isArray(chart.x) ? chart.x : null;
     const datasets = (chart.series || []).map((series, seriesIndex) => {
       const color = palette[(index + seriesIndex) % palette.length];
+      const data = series.data || [];
       return {
         label: series.label || `Series ${seriesIndex + 1}`,
-        data: series.data || [],
+        data: positions ? data.map((y, point) => ({ x: positions[point], y })) : data,
         borderColor: color,
         backgroundColor: `${color}66`,
         tension: 0.35,
@@ -90,10 +129,12 @@ function renderCharts() {
               color: "#e6f3ff",
             },
           },
+          tooltip: positions ? { callbacks: { title: (items) => String(chart.labels[items[0].dataIndex]) } } : {},
         },
         scales: {
           x: {
-            ticks: { color: "#9bb0c9" },
+            ...(positions ? positionScale(positions) : {}),
+            ticks: { color: "#9bb0c9", ...(positions ? positionTicks(positions, chart.labels || []) : {}) },
             grid: { color: "rgba(255,255,255,0.05)" },
           },
           y: {
@@ -106,6 +147,151 @@ function renderCharts() {
   });
 }
 
+function loadChunk(chunks, index) {
+  if (chunks.mode !== "sidecar") {
+    const element = document.getElementById(`report-rows-${chunks.key}-${index}`);
+    return Promise.resolve(element ? JSON.parse(element.textContent || "[]") : []);
+  }
+  return new Promise((resolve, reject) => {
+    const script = document.createElement("script");
+    script.src = `${chunks.base}${index}.js`;
+    chunkWaiters.set(`${chunks.key}-${index}`, resolve);
+    script.onload = () => script.remove();
+    script.onerror = () => {
+      chunkWaiters.delete(`${chunks.key}-${index}`);
+      script.remove();
+      reject(new Error(`Could not load ${script.src}`));
+    };
+    document.body.appendChild(script);
+  });
+}
+
+function appendRows(tbody, rows) {
+  const fragment = document.createDocumentFragment();
+  rows.forEach((row) => {
+    const tr = document.createElement("tr");
+    row.forEach((cell) => {
+      const td = document.createElement("td");
+      td.textContent = cell;
+      tr.appendChild(td);
+    });
+    fragment.appendChild(tr);
+  });
+  tbody.appendChild(fragment);
+}
+
+function collapseRows(tbody, columns) {
+  // One spacer row of the same height keeps the scroll position and scrollbar.
+  const spacer = document.createElement("tr");
+  spacer.className = "table-spacer";
+  const cell = document.createElement("td");
+  cell.colSpan = Math.max(columns, 1);
+  cell.style.height = `${tbody.getBoundingClientRect().height}px`;
+  spacer.appendChild(cell);
+  tbody.replaceChildren(spacer);
+}
+
+function streamChunks(table, tableEl, firstBody, status) {
+  const chunks = table.chunks;
+  const bodies = [firstBody];
+  const rendered = new Set([0]);
+  const pending = new Set();
+  let shown = table.rows.length;
+  const update = () => {
+    status.textContent = `Showing ${shown.toLocaleString()} of ${chunks.total.toLocaleString()} rows`;
+  };
+  update();
+
+  const near = (element) => {
+    const rect = element.getBoundingClientRect();
+    return rect.bottom > -TABLE_WINDOW_MARGIN && rect.top < window.innerHeight + TABLE_WINDOW_MARGIN;
+  };
+
+  // Render chunk `index` (appending it if new), then collapse rendered chunks far from the viewport.
+  const show = async (index) => {
+    if (rendered.has(index) || pending.has(index)) {
+      return;
+    }
+    pending.add(index);
+    try {
+      const rows = index === 0 ? table.rows : await loadChunk(chunks, index);
+      let tbody = bodies[index];
+      if (tbody) {
+        observer?.unobserve(tbody);
+        tbody.replaceChildren();
+      } else {
+        tbody = document.createElement("tbody");
+        tbody.dataset.chunk = String(index);
+        bodies[index] = tbody;
+        tableEl.appendChild(tbody);
+        shown += rows.length;
+        update();
+      }
+      appendRows(tbody, rows);
+      rendered.add(index);
+    } finally {
+      pending.delete(index);
+    }
+    if (!observer) {
+      return;
+    }
+    [...rendered].forEach((other) => {
+      if (other !== index && !near(bodies[other])) {
+        collapseRows(bodies[other], table.columns.length);
+        rendered.delete(other);
+        observer.observe(bodies[other]);
+      }
+    });
+  };
+
+  let loading = false;
+  const loadNext = async () => {
+    if (loading || bodies.length >= chunks.count) {
+      return;
+    }
+    loading = true;
+    try {
+      await show(bodies.length);
+    } catch (error) {
+      console.error("Table chunk failed to load", error);
+      observer?.unobserve(status);
+      return;
+    } finally {
+      loading = false;
+    }
+    if (bodies.length >= chunks.count) {
+      observer?.unobserve(status);
+      return;
+    }
+    // Keep going while the end of the table is still on screen.
+    if (!observer || near(status)) {
+      loadNext();
+    }
+  };
+
+  const observer = "IntersectionObserver" in window
+    ? new IntersectionObserver((entries) => {
+      entries.forEach((entry) => {
+        if (!entry.isIntersecting) {
+          return;
+        }
+        if (entry.target === status) {
+          loadNext();
+        } else {
+          show(Number(entry.target.dataset.chunk)).catch((error) => {
+            console.error("Table chunk failed to load", error);
+          });
+        }
+      });
+    }, { rootMargin: `${TABLE_WINDOW_MARGIN}px 0px` })
+    : null;
+  if (observer) {
+    observer.observe(status);
+  } else {
+    loadNext();
+  }
+}
+
 function buildTable(table, wrapperClass) {
   const wrapper = document.createElement("div");
   wrapper.className = wrapperClass;
@@ -124,19 +310,19 @@ function buildTable(table, wrapperClass) {
   thead.appendChild(headRow);
 
   const tbody = document.createElement("tbody");
-  table.rows.forEach((row) => {
-    const tr = document.createElement("tr");
-    row.forEach((cell) => {
-      const td = document.createElement("td");
-      td.textContent = cell;
-      tr.appendChild(td);
-    });
-    tbody.appendChild(tr);
-  });
+  tbody.dataset.chunk = "0";
+  appendRows(tbody, table.rows);
 
   tableEl.append(thead, tbody);
   wrapper.append(heading, tableEl);
 
+  if (table.chunks && table.chunks.count > 1) {
+    const status = document.createElement("p");
+    status.className = "table-status";
+    wrapper.appendChild(status);
+    streamChunks(table, tableEl, tbody, status);
+  }
+
   return wrapper;
 }
 
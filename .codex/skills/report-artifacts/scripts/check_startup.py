@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Fail if the report renderers' cold-start import cost exceeds a budget.
+
+Each module is imported in a fresh interpreter under `python -X importtime`;
+the best of --repeat runs is compared with --budget-ms, and importing any of
+HEAVY_MODULES at startup fails the check outright (they must stay lazy).
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_MODULES = ["render_report", "render_report_static", "render_report_batch"]
+# Loaded on demand only: URL sources, PNG charts and downsampling.
+HEAVY_MODULES = {"requests", "urllib3", "matplotlib", "numpy"}
+
+# (depth, name, self_us, cumulative_us) per `-X importtime` line, in output order.
+ImportEntry = Tuple[int, str, int, int]
+
+
+def parse_importtime(stderr: str) -> List[ImportEntry]:
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((depth, name.strip(), int(fields[0]), int(fields[1])))
+    return entries
+
+
+def import_module(module: str) -> List[ImportEntry]:
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure imports, not compilation
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def module_cost(entries: List[ImportEntry], module: str) -> Tuple[int, List[ImportEntry], List[str]]:
+    """Cumulative microseconds for `module`, its direct imports and any heavy packages it pulled in."""
+    end = next((idx for idx, entry in enumerate(entries) if entry[0] == 0 and entry[1] == module), None)
+    if end is None:
+        raise ValueError(f"{module} missing from -X importtime output")
+    # Children are listed before their parent; earlier top-level entries were imported by site.
+    start = max((idx for idx in range(end) if entries[idx][0] == 0), default=-1) + 1
+    tree = entries[start:end]
+    children = [entry for entry in tree if entry[0] == 1]
+    heavy = sorted({entry[1].split(".")[0] for entry in tree} & HEAVY_MODULES)
+    return entries[end][3], children, heavy
+
+
+def check_module(module: str, budget_ms: float, repeat: int, top: int) -> bool:
+    import_module(module)  # warm the bytecode and filesystem caches
+    runs = [import_module(module) for _ in range(repeat)]
+    costs = [module_cost(entries, module) for entries in runs]
+    total, children, heavy = min(costs, key=lambda cost: cost[0])
+    ms = total / 1000
+    ok = ms <= budget_ms and not heavy
+    print(f"{module}: {ms:.1f} ms of imports (best of {repeat}, budget {budget_ms:.0f} ms): {'ok' if ok else 'OVER BUDGET'}")
+    for _, name, _, cumulative in sorted(children, key=lambda entry: -entry[3])[:top]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+    if heavy:
+        print(f"  imported at startup: {', '.join(heavy)}")
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check report renderer startup import time against a budget.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Script modules to import.")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Allowed cumulative import time per module.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (best is kept).")
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to list.")
+    args = parser.parse_args(argv)
+
+    results = [check_module(module, args.budget_ms, max(1, args.repeat), args.top) for module in args.modules]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,67 +1,111 @@
 #!/usr/bin/env python3
 import argparse
-import csv
 import json
+import re
 from pathlib import Path
-from typing import Any, Dict
-import requests
-from jinja2 import Environment, FileSystemLoader
-
-
-def load_json(source: str) -> Dict[str, Any]:
-    if source.startswith("http://") or source.startswith("https://"):
-        response = requests.get(source, timeout=30)
-        response.raise_for_status()
-        return response.json()
-
-    with open(source, "r", encoding="utf-8") as handle:
-        return json.load(handle)
-
-
-def load_csv(source: str) -> Dict[str, Any]:
-    if source.startswith("http://") or source.startswith("https://"):
-        response = requests.get(source, timeout=30)
-        response.raise_for_status()
-        lines = response.text.splitlines()
-        reader = csv.reader(lines)
+from typing import Any, Dict, List, Optional, Tuple
+from jinja2 import Environment
+
+from report_data import add_data_arguments, downsample_charts, json_default, resolve_data, template_env
+
+# Tables longer than this are split; report.js renders further chunks on scroll.
+TABLE_CHUNK_ROWS = 1000
+CHUNK_MODES = ("inline", "sidecar")
+# Sidecar chunk scripts are named <key>-<index>.js; cleanup never touches other files.
+CHUNK_FILE_RE = re.compile(r"(?:table|tables\d+)-\d+\.js")
+# Widest chart card in report.css, in CSS pixels; line series are cut to ~2 points per pixel.
+CHART_WIDTH = 1000
+
+
+def script_safe(text: str) -> str:
+    # JSON embedded in a <script> element must not contain "</" verbatim.
+    return text.replace("</", "<\\/")
+
+
+def chunk_json(rows: List[Any]) -> str:
+    return script_safe(json.dumps(rows, ensure_ascii=True, separators=(",", ":")))
+
+
+def clear_chunk_dir(chunk_dir: Path) -> None:
+    """Delete sidecar chunk scripts in `chunk_dir`, then the directory if nothing else is left."""
+    if not chunk_dir.is_dir():
+        return
+    for path in chunk_dir.iterdir():
+        if CHUNK_FILE_RE.fullmatch(path.name) and path.is_file():
+            path.unlink()
+    if not any(chunk_dir.iterdir()):
+        chunk_dir.rmdir()
+
+
+def chunk_tables(
+    data: Dict[str, Any], output_path: Path, chunk_rows: int, mode: str
+) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+    """Keep the first chunk of each long table inline and split off the rest.
+
+    Returns a shallow copy of `data` for the report JSON plus the inline chunk
+    elements to emit. In sidecar mode chunks are written next to the HTML as
+    small scripts, which load over file:// where fetch() would be blocked.
+    """
+    if chunk_rows <= 0:
+        return data, []
+    chunk_dir = output_path.parent / f"{output_path.stem}-chunks"
+    if mode == "sidecar":
+        clear_chunk_dir(chunk_dir)  # drop chunks from an earlier render
+
+    data = dict(data)
+    if data.get("tables"):
+        # report.js ignores `table` when `tables` is present, so its rows are never chunked.
+        data["tables"] = list(data["tables"])
+        tables = [("tables", idx, table) for idx, table in enumerate(data["tables"])]
     else:
-        handle = open(source, "r", encoding="utf-8", newline="")
-        reader = csv.reader(handle)
-
-    rows = list(reader)
-    if not rows:
-        return {"title": "AI Report", "table": {"columns": [], "rows": []}}
-
-    columns = rows[0]
-    table_rows = rows[1:]
-
-    return {
-        "title": "AI Report",
-        "summary": "Generated from CSV source.",
-        "table": {
-            "title": "Source data",
-            "columns": columns,
-            "rows": table_rows,
-        },
-    }
-
-
-def resolve_data(source: str) -> Dict[str, Any]:
-    if source.lower().endswith(".csv"):
-        return load_csv(source)
-    return load_json(source)
-
-
-def render_report(data: Dict[str, Any], template_dir: Path, output_path: Path) -> None:
-    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+        tables = [("table", None, data.get("table"))]
+
+    inline: List[Dict[str, str]] = []
+    for key, idx, table in tables:
+        if not table or len(table.get("rows") or []) <= chunk_rows:
+            continue
+        chunk_key = key if idx is None else f"{key}{idx}"
+        rows = table["rows"]
+        count = -(-len(rows) // chunk_rows)
+        table = dict(table, rows=rows[:chunk_rows])
+        table["chunks"] = {"key": chunk_key, "mode": mode, "count": count, "total": len(rows)}
+        if mode == "sidecar":
+            chunk_dir.mkdir(parents=True, exist_ok=True)
+            table["chunks"]["base"] = f"{chunk_dir.name}/{chunk_key}-"
+        for index in range(1, count):
+            text = chunk_json(rows[index * chunk_rows:(index + 1) * chunk_rows])
+            if mode == "inline":
+                inline.append({"id": f"report-rows-{chunk_key}-{index}", "json": text})
+            else:
+                script = f"reportChunk({json.dumps(chunk_key)}, {index}, {text});\n"
+                (chunk_dir / f"{chunk_key}-{index}.js").write_text(script, encoding="utf-8")
+        if idx is None:
+            data[key] = table
+        else:
+            data[key][idx] = table
+    return data, inline
+
+
+def render_report(
+    data: Dict[str, Any],
+    template_dir: Path,
+    output_path: Path,
+    chunk_rows: int = TABLE_CHUNK_ROWS,
+    chunk_mode: str = "inline",
+    chart_width: int = CHART_WIDTH,
+    env: Optional[Environment] = None,
+) -> None:
+    env = env or template_env(template_dir)
     template = env.get_template("report.html")
 
-    report_json = json.dumps(data, ensure_ascii=True, indent=2)
+    report_data, row_chunks = chunk_tables(downsample_charts(data, chart_width), output_path, chunk_rows, chunk_mode)
+    report_json = script_safe(json.dumps(report_data, ensure_ascii=True, indent=2, default=json_default))
     html = template.render(
         title=data.get("title"),
         subtitle=data.get("subtitle"),
         summary=data.get("summary"),
         report_json=report_json,
+        row_chunks=row_chunks,
     )
 
     output_path.write_text(html, encoding="utf-8")
@@ -76,14 +120,33 @@ def main() -> None:
         help="Path to report-template directory (defaults to skill assets).",
     )
     parser.add_argument("--out", required=True, help="Output HTML file path.")
+    add_data_arguments(parser)
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=TABLE_CHUNK_ROWS,
+        help="Rows per table chunk; longer tables load further chunks on scroll (0 = embed every row).",
+    )
+    parser.add_argument(
+        "--chunk-mode",
+        choices=CHUNK_MODES,
+        default="inline",
+        help="Keep later chunks inside the HTML, or write them to <out>-chunks/ next to it.",
+    )
+    parser.add_argument(
+        "--chart-width",
+        type=int,
+        default=CHART_WIDTH,
+        help="Pixel width line series are downsampled for (0 = embed every point).",
+    )
     args = parser.parse_args()
 
     script_dir = Path(__file__).resolve().parent
     default_template_dir = script_dir.parent / "assets" / "report-template"
     template_dir = Path(args.template_dir) if args.template_dir else default_template_dir
 
-    data = resolve_data(args.data)
-    render_report(data, template_dir, Path(args.out))
+    data = resolve_data(args.data, args.max_rows, args.sample, args.seed)
+    render_report(data, template_dir, Path(args.out), args.chunk_rows, args.chunk_mode, args.chart_width)
 
 
 if __name__ == "__main__":
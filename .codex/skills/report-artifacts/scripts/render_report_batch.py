@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Render many reports in one warm process (or a small pool of them).
+
+Jobs come from repeated `--job DATA OUT` pairs and/or a JSON manifest:
+
+  [{"data": "sales.csv", "out": "sales.html"},
+   {"data": "ops.json", "out": "ops-static.html", "static": true, "max_rows": 500}]
+
+Imports, the Jinja environment and the chart cache are set up once per process,
+and compiled templates persist in a bytecode cache between runs.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import render_report as interactive
+import render_report_static as static
+from report_data import SAMPLE_MODES, add_data_arguments, is_url, resolve_data, template_env
+
+JOB_KEYS = {"data", "out", "static", "max_rows", "sample", "seed", "chunk_rows", "chunk_mode", "chart_width", "chart_backend"}
+DEFAULT_BYTECODE_CACHE = static.DEFAULT_CHART_CACHE.parent / "report-templates"
+
+# Per-process state, filled by init_worker.
+WORKER: Dict[str, Any] = {}
+
+
+def load_jobs(manifest: Optional[str], pairs: List[List[str]], defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    jobs = [{"data": data, "out": out} for data, out in pairs]
+    if manifest:
+        base = Path(manifest).resolve().parent
+        with open(manifest, "r", encoding="utf-8") as handle:
+            listed = json.load(handle)
+        if not isinstance(listed, list):
+            raise ValueError("manifest must hold a JSON list of jobs")
+        for job in listed:
+            job = dict(job)
+            if job.get("data") and not is_url(job["data"]):
+                job["data"] = str(base / job["data"])
+            if job.get("out"):
+                job["out"] = str(base / job["out"])
+            jobs.append(job)
+
+    for idx, job in enumerate(jobs):
+        unknown = set(job) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"job {idx}: unknown keys {sorted(unknown)}")
+        if not job.get("data") or not job.get("out"):
+            raise ValueError(f"job {idx}: needs both data and out")
+        if job.get("sample", "head") not in SAMPLE_MODES:
+            raise ValueError(f"job {idx}: sample must be one of {', '.join(SAMPLE_MODES)}")
+        if job.get("chart_backend", "auto") not in static.CHART_BACKENDS:
+            raise ValueError(f"job {idx}: chart_backend must be one of {', '.join(static.CHART_BACKENDS)}")
+        for key, value in defaults.items():
+            job.setdefault(key, value)
+    outs = [str(Path(job["out"]).resolve()) for job in jobs]
+    if len(set(outs)) != len(outs):
+        raise ValueError("job outputs must be unique")
+    return jobs
+
+
+def init_worker(template_dir: Path, bytecode_dir: Optional[Path], chart_cache_dir: Optional[Path], chart_cache_bytes: int):
+    WORKER["template_dir"] = template_dir
+    WORKER["env"] = template_env(template_dir, bytecode_dir)
+    WORKER["chart_cache"] = static.ChartCache(chart_cache_dir, chart_cache_bytes) if chart_cache_dir else None
+
+
+def render_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    data = resolve_data(job["data"], job["max_rows"], job["sample"], job["seed"])
+    out = Path(job["out"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if job.get("static"):
+        static.render_report(
+            data,
+            WORKER["template_dir"],
+            out,
+            chart_workers=1,  # reports are the unit of parallelism here
+            chart_cache=WORKER["chart_cache"],
+            chart_width=job.get("chart_width", static.CHART_WIDTH),
+            env=WORKER["env"],
+            chart_backend=job.get("chart_backend", "auto"),
+        )
+    else:
+        interactive.render_report(
+            data,
+            WORKER["template_dir"],
+            out,
+            job.get("chunk_rows", interactive.TABLE_CHUNK_ROWS),
+            job.get("chunk_mode", "inline"),
+            job.get("chart_width", interactive.CHART_WIDTH),
+            env=WORKER["env"],
+        )
+    return {"out": str(out), "seconds": time.perf_counter() - start, "pid": os.getpid()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render many report HTML files in one process.")
+    parser.add_argument("--manifest", default=None, help="JSON list of jobs (paths relative to the manifest).")
+    parser.add_argument(
+        "--job",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("DATA", "OUT"),
+        help="One report to render; repeat for more.",
+    )
+    parser.add_argument("--static", action="store_true", help="Render jobs without a \"static\" key as static reports.")
+    parser.add_argument(
+        "--template-dir",
+        default=None,
+        help="Path to report-template directory (defaults to skill assets).",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Render processes (0 = one per core).")
+    parser.add_argument(
+        "--bytecode-cache",
+        default=str(DEFAULT_BYTECODE_CACHE),
+        help="Directory for compiled Jinja templates, reused across runs.",
+    )
+    parser.add_argument("--no-bytecode-cache", action="store_true", help="Compile templates from source every run.")
+    parser.add_argument("--chart-cache", default=str(static.DEFAULT_CHART_CACHE), help="Directory for cached chart images.")
+    parser.add_argument("--chart-cache-mb", type=float, default=static.DEFAULT_CHART_CACHE_MB, help="Chart cache size limit.")
+    parser.add_argument("--no-chart-cache", action="store_true", help="Always re-render every chart.")
+    parser.add_argument(
+        "--chart-backend",
+        choices=static.CHART_BACKENDS,
+        default="auto",
+        help="Chart backend for static jobs without a \"chart_backend\" key.",
+    )
+    add_data_arguments(parser)
+    args = parser.parse_args()
+
+    defaults = {
+        "static": args.static,
+        "max_rows": args.max_rows,
+        "sample": args.sample,
+        "seed": args.seed,
+        "chart_backend": args.chart_backend,
+    }
+    jobs = load_jobs(args.manifest, args.job, defaults)
+    if not jobs:
+        parser.error("pass --manifest and/or at least one --job DATA OUT")
+
+    script_dir = Path(__file__).resolve().parent
+    default_template_dir = script_dir.parent / "assets" / "report-template"
+    template_dir = Path(args.template_dir) if args.template_dir else default_template_dir
+    init_args = (
+        template_dir,
+        None if args.no_bytecode_cache else Path(args.bytecode_cache),
+        None if args.no_chart_cache else Path(args.chart_cache),
+        int(args.chart_cache_mb * 1024 * 1024),
+    )
+
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    started = time.perf_counter()
+    failures = 0
+
+    def report(idx: int, result: Optional[Dict[str, Any]], exc: Optional[BaseException]) -> None:
+        nonlocal failures
+        if exc is None:
+            print(f"Rendered {result['out']} in {result['seconds']:.2f}s")
+        else:  # keep going; the exit status records the failure
+            failures += 1
+            print(f"Failed {jobs[idx]['data']}: {exc}", file=sys.stderr)
+
+    if workers == 1:
+        init_worker(*init_args)
+        for idx, job in enumerate(jobs):
+            try:
+                result = render_job(job)
+            except Exception as exc:
+                report(idx, None, exc)
+            else:
+                report(idx, result, None)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as pool:
+            futures = {pool.submit(render_job, job): idx for idx, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                exc = future.exception()
+                report(futures[future], None if exc else future.result(), exc)
+
+    print(f"Rendered {len(jobs) - failures}/{len(jobs)} reports in {time.perf_counter() - started:.2f}s")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
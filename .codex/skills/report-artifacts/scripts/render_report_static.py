@@ -1,74 +1,87 @@
 #!/usr/bin/env python3
 import argparse
 import base64
-import csv
 import io
 import json
+import math
+import os
+from bisect import bisect_left
+from functools import lru_cache
+from importlib import util
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import requests
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment
+from markupsafe import escape
 
+from report_data import add_data_arguments, downsample_charts, resolve_data, template_env
 
-def load_json(source: str) -> Dict[str, Any]:
-    if source.startswith("http://") or source.startswith("https://"):
-        response = requests.get(source, timeout=30)
-        response.raise_for_status()
-        return response.json()
+# Below this many charts a worker pool costs more to start than it saves.
+PARALLEL_MIN_CHARTS = 4
 
-    with open(source, "r", encoding="utf-8") as handle:
-        return json.load(handle)
+CHART_PALETTE = ["#4cc3ff", "#b44bff", "#ff4fd8", "#2ee6c7", "#6aa9ff"]
+CHART_FIGSIZE = (4.6, 2.8)
+CHART_DPI = 160
+CHART_FACE = "#0c101c"
+CHART_TICK = "#9bb0c9"
+CHART_LEGEND = "#e6f3ff"
+CHART_WIDTH = int(CHART_FIGSIZE[0] * CHART_DPI)  # rendered pixels; line series are cut to ~2 points per pixel
+# Line charts with more labels than this get CHART_MAX_TICKS evenly spaced ticks instead of one per label.
+CHART_MAX_LABELS = 24
+CHART_MAX_TICKS = 6
 
+CHART_BACKENDS = ("auto", "matplotlib", "svg")
+# SVG layout in chart_image's pixel space: axes margins and font sizes (10pt ticks, 7pt legend at CHART_DPI).
+SVG_MARGIN = {"left": 62, "right": 14, "top": 14, "bottom": 40}
+SVG_TICK_FONT = 22
+SVG_LEGEND_FONT = 15
+SVG_LINE_WIDTH = 4.4
+
+CHART_CACHE_VERSION = 2  # bump when chart_image output changes
+DEFAULT_CHART_CACHE = Path(os.environ.get("CODEX_HOME", Path.home() / ".codex")) / "skill-cache" / "report-charts"
+DEFAULT_CHART_CACHE_MB = 64
+
+
+def pyplot():
+    # Imported on first use so reports served from the chart cache never load matplotlib.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
-def load_csv(source: str) -> Dict[str, Any]:
-    if source.startswith("http://") or source.startswith("https://"):
-        response = requests.get(source, timeout=30)
-        response.raise_for_status()
-        lines = response.text.splitlines()
-        reader = csv.reader(lines)
-    else:
-        handle = open(source, "r", encoding="utf-8", newline="")
-        reader = csv.reader(handle)
-
-    rows = list(reader)
-    if not rows:
-        return {"title": "AI Report", "table": {"columns": [], "rows": []}}
-
-    columns = rows[0]
-    table_rows = rows[1:]
-
-    return {
-        "title": "AI Report",
-        "summary": "Generated from CSV source.",
-        "table": {
-            "title": "Source data",
-            "columns": columns,
-            "rows": table_rows,
-        },
-    }
 
+def point_positions(chart: Dict[str, Any]) -> List[int]:
+    """X coordinate of each point: its index in the full series, which "x" keeps for downsampled charts."""
+    return chart.get("x") or list(range(len(chart.get("labels", []))))
 
-def resolve_data(source: str) -> Dict[str, Any]:
-    if source.lower().endswith(".csv"):
-        return load_csv(source)
-    return load_json(source)
+
+def spread_ticks(positions: List[int]) -> List[int]:
+    """Indices into `positions` of CHART_MAX_TICKS evenly spaced ticks, snapped to the nearest point."""
+    if not positions:
+        return []
+    first, span = positions[0], positions[-1] - positions[0]
+    ticks = set()
+    for step in range(CHART_MAX_TICKS):
+        target = first + round(step * span / (CHART_MAX_TICKS - 1))
+        idx = bisect_left(positions, target)
+        if idx == len(positions) or (idx and target - positions[idx - 1] < positions[idx] - target):
+            idx -= 1
+        ticks.add(idx)
+    return sorted(ticks)
 
 
 def chart_image(chart: Dict[str, Any]) -> str:
+    plt = pyplot()
     labels = chart.get("labels", [])
     series = chart.get("series", [])
     chart_type = chart.get("type", "line")
 
-    fig, ax = plt.subplots(figsize=(4.6, 2.8), dpi=160)
+    fig, ax = plt.subplots(figsize=CHART_FIGSIZE, dpi=CHART_DPI)
     fig.patch.set_alpha(0.0)
-    ax.set_facecolor("#0c101c")
-    ax.tick_params(colors="#9bb0c9")
+    ax.set_facecolor(CHART_FACE)
+    ax.tick_params(colors=CHART_TICK)
 
-    palette = ["#4cc3ff", "#b44bff", "#ff4fd8", "#2ee6c7", "#6aa9ff"]
+    palette = CHART_PALETTE
 
     if chart_type == "bar":
         width = 0.75 / max(len(series), 1)
@@ -87,19 +100,25 @@ def chart_image(chart: Dict[str, Any]) -> str:
         ax.set_xticks(x_positions)
         ax.set_xticklabels(labels)
     else:
+        positions = point_positions(chart)
+        x_values = labels if len(labels) <= CHART_MAX_LABELS and "x" not in chart else positions
         for idx, series_item in enumerate(series):
             data = series_item.get("data", [])
             ax.plot(
-                labels,
+                x_values,
                 data,
                 color=palette[idx % len(palette)],
                 linewidth=2,
                 label=series_item.get("label", ""),
             )
+        if x_values is not labels:
+            ticks = spread_ticks(positions)
+            ax.set_xticks([positions[tick] for tick in ticks])
+            ax.set_xticklabels([str(labels[tick]) for tick in ticks])
 
     ax.grid(color="white", alpha=0.08, linewidth=0.8)
     if any(item.get("label") for item in series):
-        ax.legend(frameon=False, labelcolor="#e6f3ff", fontsize=7)
+        ax.legend(frameon=False, labelcolor=CHART_LEGEND, fontsize=7)
 
     buf = io.BytesIO()
     fig.tight_layout()
@@ -109,16 +128,299 @@ def chart_image(chart: Dict[str, Any]) -> str:
     return base64.b64encode(buf.getvalue()).decode("ascii")
 
 
-def render_report(data: Dict[str, Any], template_dir: Path, output_path: Path) -> None:
-    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+def warm_chart_worker() -> None:
+    # Pay matplotlib's first-draw costs (font cache, Agg canvas) once per worker.
+    plt = pyplot()
+    fig, ax = plt.subplots(figsize=(1, 1), dpi=16)
+    ax.plot([0, 1], [0, 1])
+    ax.legend(["warm"], fontsize=7)
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+
+
+def nice_ticks(low: float, high: float, target: int = 7) -> List[float]:
+    """Round-numbered ticks covering [low, high], like matplotlib's default locator."""
+    if high <= low:
+        high = low + 1.0
+    raw = (high - low) / target
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(mult * magnitude for mult in (1, 2, 2.5, 5, 10) if mult * magnitude >= raw)
+    start = math.ceil(low / step - 1e-9)
+    return [round(tick * step, 12) for tick in range(start, math.floor(high / step + 1e-9) + 1)]
+
+
+def tick_text(value: float, ticks: List[float]) -> str:
+    step = ticks[1] - ticks[0] if len(ticks) > 1 else 1.0
+    decimals = max(0, -math.floor(math.log10(step) + 1e-9)) + (1 if round(step / 10 ** math.floor(math.log10(step)), 6) == 2.5 else 0)
+    return f"{value:.{decimals}f}".replace("-", "\u2212")
+
+
+def svg_number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def chart_svg(chart: Dict[str, Any]) -> str:
+    """Inline SVG twin of chart_image: same palette, size and layout, no matplotlib."""
+    labels = chart.get("labels", [])
+    series = chart.get("series", [])
+    chart_type = chart.get("type", "line")
+    width, height = int(CHART_FIGSIZE[0] * CHART_DPI), int(CHART_FIGSIZE[1] * CHART_DPI)
+    top = SVG_MARGIN["top"]
+    right, bottom = width - SVG_MARGIN["right"], height - SVG_MARGIN["bottom"]
+
+    values = [[svg_number(value) for value in item.get("data", [])] for item in series]
+    finite = [value for row in values for value in row if value is not None]
+    count = max([len(labels)] + [len(row) for row in values])
+    positions = point_positions(chart) if chart_type != "bar" and "x" in chart else list(range(count))
+    if chart_type == "bar":
+        y_low, y_high = min(finite + [0.0]), max(finite + [0.0])
+        x_low, x_high = -0.5, max(count, 1) - 0.5
+    else:
+        y_low, y_high = (min(finite), max(finite)) if finite else (0.0, 1.0)
+        x_low, x_high = 0.0, float(max(positions[-1] if positions else 0, 1))
+    pad = (y_high - y_low) * 0.05 or 0.5
+    y_low, y_high = (y_low if chart_type == "bar" and y_low == 0 else y_low - pad), y_high + pad
+    x_pad = (x_high - x_low) * 0.05
+    x_low, x_high = x_low - x_pad, x_high + x_pad
+    y_ticks = [tick for tick in nice_ticks(y_low, y_high) if y_low <= tick <= y_high]
+    widest = max((len(tick_text(tick, y_ticks)) for tick in y_ticks), default=0)
+    left = max(SVG_MARGIN["left"], int(16 + widest * SVG_TICK_FONT * 0.62))
+
+    def sx(x: float) -> float:
+        return left + (x - x_low) / (x_high - x_low) * (right - left)
+
+    def sy(y: float) -> float:
+        return bottom - (y - y_low) / (y_high - y_low) * (bottom - top)
+
+    parts = [
+        f'<svg class="chart-image" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" role="img"'
+        f' aria-label="{escape(str(chart.get("title", "")))}" font-family="DejaVu Sans, Helvetica, Arial, sans-serif">',
+        f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="{CHART_FACE}"/>',
+    ]
+    grid = []
+    for tick in y_ticks:
+        y = sy(tick)
+        grid.append(f"M{left} {y:.1f}H{right}")
+        parts.append(
+            f'<text x="{left - 8}" y="{y:.1f}" fill="{CHART_TICK}" font-size="{SVG_TICK_FONT}"'
+            f' text-anchor="end" dominant-baseline="central">{tick_text(tick, y_ticks)}</text>'
+        )
+
+    if (len(labels) <= CHART_MAX_LABELS and "x" not in chart) or chart_type == "bar":
+        x_ticks = list(range(len(labels)))
+    else:
+        x_ticks = spread_ticks(positions[:len(labels)])
+    for tick in x_ticks:
+        x = sx(positions[tick])
+        grid.append(f"M{x:.1f} {top}V{bottom}")
+        parts.append(
+            f'<text x="{x:.1f}" y="{bottom + 8}" fill="{CHART_TICK}" font-size="{SVG_TICK_FONT}"'
+            f' text-anchor="middle" dominant-baseline="hanging">{escape(str(labels[tick]))}</text>'
+        )
+    if grid:
+        parts.insert(2, f'<path d="{"".join(grid)}" stroke="white" stroke-opacity="0.08" stroke-width="1.8"/>')
+
+    points: List[tuple] = []  # drawn vertices, and bar rects as (x0, y0, x1, y1), for legend placement
+    bars: List[tuple] = []
+    for idx, row in enumerate(values):
+        color = CHART_PALETTE[idx % len(CHART_PALETTE)]
+        if chart_type == "bar":
+            bar = 0.75 / max(len(series), 1)
+            offset = (idx - (len(series) - 1) / 2) * bar
+            base = sy(max(y_low, 0.0))
+            for pos, value in enumerate(row):
+                if value is None:
+                    continue
+                x0, x1, y = sx(pos + offset - bar / 2), sx(pos + offset + bar / 2), sy(value)
+                bars.append((x0, min(y, base), x1, max(y, base)))
+                parts.append(
+                    f'<rect x="{x0:.1f}" y="{min(y, base):.1f}" width="{x1 - x0:.1f}" height="{abs(base - y):.1f}"'
+                    f' fill="{color}" fill-opacity="0.85"/>'
+                )
+        else:
+            path, pen_down = [], False
+            for pos, value in enumerate(row):
+                if value is None:
+                    pen_down = False
+                    continue
+                points.append((sx(positions[pos]), sy(value)))
+                path.append(f"{'L' if pen_down else 'M'}{points[-1][0]:.1f} {points[-1][1]:.1f}")
+                pen_down = True
+            parts.append(
+                f'<path d="{"".join(path)}" fill="none" stroke="{color}" stroke-width="{SVG_LINE_WIDTH}"'
+                f' stroke-linejoin="round" stroke-linecap="square"/>'
+            )
+
+    parts.append(f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="none" stroke="black" stroke-width="1.8"/>')
+    legend = [(idx, item.get("label", "")) for idx, item in enumerate(series)]
+    if any(label for _, label in legend):
+        # Like matplotlib's loc="best": the corner whose box covers the fewest marks.
+        box_w = 48 + max(len(str(label)) for _, label in legend) * SVG_LEGEND_FONT * 0.6
+        box_h = len(legend) * (SVG_LEGEND_FONT + 8) + 8
+        corners = [(right - 10 - box_w, top + 10), (left + 10, top + 10), (left + 10, bottom - 10 - box_h), (right - 10 - box_w, bottom - 10 - box_h)]
+
+        def covered(corner: tuple) -> int:
+            x0, y0 = corner
+            x1, y1 = x0 + box_w, y0 + box_h
+            hits = sum(1 for x, y in points if x0 <= x <= x1 and y0 <= y <= y1)
+            return hits + sum(1 for bx0, by0, bx1, by1 in bars if bx0 < x1 and bx1 > x0 and by0 < y1 and by1 > y0)
+
+        box_x, box_y = min(corners, key=covered)
+        for row_idx, (idx, label) in enumerate(legend):
+            color = CHART_PALETTE[idx % len(CHART_PALETTE)]
+            y = box_y + 4 + (row_idx + 0.5) * (SVG_LEGEND_FONT + 8)
+            parts.append(f'<path d="M{box_x:.1f} {y:.1f}h30" stroke="{color}" stroke-width="{SVG_LINE_WIDTH}"/>')
+            parts.append(
+                f'<text x="{box_x + 38:.1f}" y="{y:.1f}" fill="{CHART_LEGEND}" font-size="{SVG_LEGEND_FONT}"'
+                f' dominant-baseline="central">{escape(str(label))}</text>'
+            )
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def resolve_chart_backend(backend: str) -> str:
+    if backend == "auto":
+        return "matplotlib" if util.find_spec("matplotlib") else "svg"
+    return backend
+
+
+@lru_cache(maxsize=None)
+def matplotlib_version() -> Optional[str]:
+    from importlib import metadata  # reads package metadata without importing matplotlib
+
+    try:
+        return metadata.version("matplotlib")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def chart_key(chart: Dict[str, Any]) -> str:
+    """Content hash of everything that affects a chart's pixels."""
+    import hashlib  # loads OpenSSL; only cached PNG charts need it
+
+    spec = {
+        "version": CHART_CACHE_VERSION,
+        "matplotlib": matplotlib_version(),
+        "style": [CHART_PALETTE, CHART_FIGSIZE, CHART_DPI, CHART_FACE, CHART_TICK, CHART_LEGEND, CHART_MAX_LABELS, CHART_MAX_TICKS],
+        "type": chart.get("type", "line"),
+        "labels": chart.get("labels", []),
+        "series": chart.get("series", []),
+    }
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), ensure_ascii=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """Encoded chart images on disk, keyed by chart_key, evicted least recently used past max_bytes."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_CHART_CACHE_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.b64"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            image = path.read_text(encoding="ascii")
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return image
+
+    def put(self, key: str, image: str) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(image, encoding="ascii")
+        os.replace(tmp, path)
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.root.glob("*.b64"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+
+def chart_images(charts: List[Dict[str, Any]], workers: int = 0, cache: Optional[ChartCache] = None) -> List[str]:
+    """Render charts to base64 PNGs, in order; workers=0 picks one per core.
+
+    Charts found in `cache` are returned without touching matplotlib.
+    """
+    images: List[Optional[str]] = [None] * len(charts)
+    keys: List[Optional[str]] = [None] * len(charts)
+    if cache is not None:
+        for idx, chart in enumerate(charts):
+            keys[idx] = chart_key(chart)
+            images[idx] = cache.get(keys[idx])
+    todo = [idx for idx, image in enumerate(images) if image is None]
+
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(todo))
+    if workers <= 1 or len(todo) < PARALLEL_MIN_CHARTS:
+        rendered = [chart_image(charts[idx]) for idx in todo]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=warm_chart_worker) as pool:
+            rendered = list(pool.map(chart_image, [charts[idx] for idx in todo]))
+
+    for idx, image in zip(todo, rendered):
+        images[idx] = image
+        if cache is not None:
+            cache.put(keys[idx], image)
+    if cache is not None and rendered:
+        cache.evict()
+    return images
+
+
+def render_report(
+    data: Dict[str, Any],
+    template_dir: Path,
+    output_path: Path,
+    chart_workers: int = 0,
+    chart_cache: Optional[ChartCache] = None,
+    chart_width: int = CHART_WIDTH,
+    env: Optional[Environment] = None,
+    chart_backend: str = "auto",
+) -> None:
+    env = env or template_env(template_dir)
     template = env.get_template("report-static.html")
 
-    charts = data.get("charts", [])
+    charts = downsample_charts(data, chart_width).get("charts", [])
     rendered_charts: List[Dict[str, Any]] = []
-    for chart in charts:
-        chart_copy = dict(chart)
-        chart_copy["image"] = chart_image(chart_copy)
-        rendered_charts.append(chart_copy)
+    if resolve_chart_backend(chart_backend) == "svg":
+        for chart in charts:
+            rendered_charts.append(dict(chart, svg=chart_svg(chart)))
+    else:
+        for chart, image in zip(charts, chart_images(charts, chart_workers, chart_cache)):
+            chart_copy = dict(chart)
+            chart_copy["image"] = image
+            rendered_charts.append(chart_copy)
 
     tables = data.get("tables")
     if tables is None and data.get("table"):
@@ -148,14 +450,47 @@ def main() -> None:
         help="Path to report-template directory (defaults to skill assets).",
     )
     parser.add_argument("--out", required=True, help="Output HTML file path.")
+    add_data_arguments(parser)
+    parser.add_argument(
+        "--chart-workers",
+        type=int,
+        default=0,
+        help="Processes for chart rendering (0 = one per core, 1 = render in-process).",
+    )
+    parser.add_argument(
+        "--chart-cache",
+        default=str(DEFAULT_CHART_CACHE),
+        help="Directory for cached chart images (reused when a chart's data and style are unchanged).",
+    )
+    parser.add_argument("--chart-cache-mb", type=float, default=DEFAULT_CHART_CACHE_MB, help="Chart cache size limit.")
+    parser.add_argument("--no-chart-cache", action="store_true", help="Always re-render every chart.")
+    parser.add_argument(
+        "--chart-width",
+        type=int,
+        default=CHART_WIDTH,
+        help="Pixel width line series are downsampled for (0 = plot every point).",
+    )
+    parser.add_argument(
+        "--chart-backend",
+        choices=CHART_BACKENDS,
+        default="auto",
+        help="PNG charts via matplotlib, or inline SVG drawn in pure Python (auto = matplotlib when installed).",
+    )
     args = parser.parse_args()
 
     script_dir = Path(__file__).resolve().parent
     default_template_dir = script_dir.parent / "assets" / "report-template"
     template_dir = Path(args.template_dir) if args.template_dir else default_template_dir
 
-    data = resolve_data(args.data)
-    render_report(data, template_dir, Path(args.out))
+    cache = None
+    if not args.no_chart_cache:
+        cache = ChartCache(Path(args.chart_cache), int(args.chart_cache_mb * 1024 * 1024))
+
+    data = resolve_data(args.data, args.max_rows, args.sample, args.seed)
+    backend = resolve_chart_backend(args.chart_backend)
+    render_report(data, template_dir, Path(args.out), args.chart_workers, cache, args.chart_width, chart_backend=backend)
+    if cache is not None and data.get("charts") and backend == "matplotlib":
+        print(f"Chart cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evicted")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""Report data loading shared by render_report.py and render_report_static.py.
+
+CSV sources are streamed: column types are inferred from the first rows, values
+are kept column-wise in compact arrays, and an optional row limit keeps the
+head, the tail or a uniform reservoir sample, so memory follows the rows kept
+rather than the size of the file. Cells are emitted as their source text.
+"""
+import array
+import collections
+import csv
+import gc
+import itertools
+import json
+import random
+import re
+from collections.abc import Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+# Rows read ahead of time to infer column types.
+INFER_ROWS = 1000
+# Rows converted per batch while filling a table.
+BATCH_ROWS = 4096
+SAMPLE_MODES = ("head", "tail", "reservoir")
+# Column kind -> array typecode; "str" columns are plain lists.
+TYPECODES = {"int": "q", "float": "d"}
+# Only text that str() reproduces is typed, so every cell comes back verbatim:
+# leading zeros (ids, zip codes), "+1", "-0", "10.00", "1e3" and nan/inf stay text.
+INT_RE = re.compile(r"(?:0|-?[1-9]\d*)\Z")
+FLOAT_RE = re.compile(r"[+-]?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?\Z")
+# Whole batches are validated in one match against the newline-joined cells.
+BATCH_RES = {
+    "int": re.compile(r"(?:{}\n)*{}".format(INT_RE.pattern[:-2], INT_RE.pattern[:-2])),
+    "float": re.compile(r"(?:{}\n)*{}".format(FLOAT_RE.pattern[:-2], FLOAT_RE.pattern[:-2])),
+}
+CONVERTERS = {"int": int, "float": float}
+# Stand-in for blank cells during batch conversion; it round-trips too.
+BLANKS = {"int": "0", "float": "0.0"}
+
+
+def is_url(source: str) -> bool:
+    return source.startswith("http://") or source.startswith("https://")
+
+
+def load_json(source: str) -> Dict[str, Any]:
+    if is_url(source):
+        import requests  # only URL sources pay for it
+
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    with open(source, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+# -------------------------
+# CSV tables
+# -------------------------
+
+def is_float_text(text: str) -> bool:
+    return FLOAT_RE.match(text) is not None and str(float(text)) == text
+
+
+def infer_kind(values: Iterator[str]) -> str:
+    kind = None
+    for text in values:
+        if text == "":
+            continue
+        # "1" next to "2.5" cannot be a float column: str(1.0) is "1.0".
+        found = "int" if INT_RE.match(text) else "float" if is_float_text(text) else "str"
+        if found == "str" or kind not in (None, found):
+            return "str"
+        kind = found
+    return kind or "str"
+
+
+class Column:
+    """One CSV column: an int64/float64 array plus a presence mask, or a list of strings.
+
+    Typed values always satisfy str(value) == source text.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.values = array.array(TYPECODES[kind]) if kind in TYPECODES else []
+        self.present = bytearray()
+
+    def parse(self, text: str) -> Any:
+        """Typed value for `text`, or None if it does not fit this column's kind."""
+        if self.kind == "str":
+            return text
+        if self.kind == "int":
+            return int(text) if INT_RE.match(text) else None
+        return float(text) if is_float_text(text) else None
+
+    def demote(self) -> None:
+        # A value the sample did not predict: keep the column as text from here on.
+        self.values = [str(value) if present else "" for value, present in zip(self.values, self.present)]
+        self.kind = "str"
+
+    def store(self, slot: int, text: str) -> None:
+        """Write `text` at `slot`; slot == len(self) appends."""
+        present = text != ""
+        value = self.parse(text) if present else ("" if self.kind == "str" else 0)
+        if value is None:
+            self.demote()
+            value = text
+        try:
+            if slot == len(self.present):
+                self.values.append(value)
+                self.present.append(present)
+            else:
+                self.values[slot] = value
+                self.present[slot] = present
+        except OverflowError:  # beyond int64
+            self.demote()
+            self.store(slot, text)
+
+    def extend(self, texts: List[str]) -> None:
+        """Append a batch of cells, converting them in bulk when they all fit."""
+        start = len(self.present)
+        present = bytes(map(bool, texts))
+        if self.kind == "str":
+            self.values.extend(texts)
+            self.present.extend(present)
+            return
+        blank = BLANKS[self.kind]
+        filled = texts if all(present) else [text or blank for text in texts]
+        if BATCH_RES[self.kind].fullmatch("\n".join(filled)):
+            try:
+                self.values.extend(map(CONVERTERS[self.kind], filled))
+                if self.kind == "int" or list(map(str, self.values[start:])) == filled:
+                    self.present.extend(present)
+                    return
+            except (OverflowError, ValueError):  # int64 overflow, or a cell holding a newline
+                pass
+            del self.values[start:]
+        for offset, text in enumerate(texts):
+            self.store(start + offset, text)
+
+    def get(self, slot: int) -> str:
+        if self.kind == "str":
+            return self.values[slot]
+        return str(self.values[slot]) if self.present[slot] else ""
+
+    def cells(self, start: int, stop: int) -> List[str]:
+        values = self.values[start:stop]
+        if self.kind == "str":
+            return values
+        texts = list(map(str, values))
+        present = self.present[start:stop]
+        if 0 in present:
+            return [text if flag else "" for text, flag in zip(texts, present)]
+        return texts
+
+
+class ColumnTable:
+    """Typed columns plus the source row number held in each slot.
+
+    Short rows are padded to the header width; cells past it are kept per slot.
+    """
+
+    def __init__(self, columns: List[str], kinds: List[str]):
+        self.columns = columns
+        self.data = [Column(kind) for kind in kinds]
+        self.order = array.array("q")
+        self.extra: Dict[int, List[str]] = {}
+        self.in_order = True
+        self.sorted_slots: Optional[List[int]] = None  # slots in source order, once rows were replaced
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def store(self, slot: int, row_number: int, row: List[str]) -> None:
+        width = len(row)
+        for idx, column in enumerate(self.data):
+            column.store(slot, row[idx] if idx < width else "")
+        if width > len(self.data):
+            self.extra[slot] = row[len(self.data):]
+        else:
+            self.extra.pop(slot, None)
+        if slot == len(self.order):
+            self.order.append(row_number)
+        else:
+            self.order[slot] = row_number
+            self.in_order = False
+            self.sorted_slots = None
+
+    def extend(self, row_number: int, rows: List[List[str]]) -> None:
+        """Append consecutive source rows starting at `row_number`."""
+        width = len(self.data)
+        first = len(self.order)
+        if set(map(len, rows)) != {width}:  # ragged batch
+            for offset, row in enumerate(rows):
+                if len(row) > width:
+                    self.extra[first + offset] = row[width:]
+            rows = [row if len(row) == width else (row + [""] * width)[:width] for row in rows]
+        for column, texts in zip(self.data, zip(*rows)):
+            column.extend(list(texts))
+        self.order.extend(range(row_number, row_number + len(rows)))
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[List[str]]:
+        """Rows `start` to `stop` in source order, rebuilt from the columns."""
+        stop = len(self.order) if stop is None else min(stop, len(self.order))
+        if not self.in_order:
+            if self.sorted_slots is None:
+                self.sorted_slots = sorted(range(len(self.order)), key=self.order.__getitem__)
+            for slot in self.sorted_slots[start:stop]:
+                yield [column.get(slot) for column in self.data] + self.extra.get(slot, [])
+            return
+        for first in range(start, stop, BATCH_ROWS):
+            last = min(first + BATCH_ROWS, stop)
+            batch = map(list, zip(*(column.cells(first, last) for column in self.data)))
+            if not self.extra:
+                yield from batch
+                continue
+            for slot, row in enumerate(batch, first):
+                row.extend(self.extra.get(slot, ()))
+                yield row
+
+
+class TableRows(Sequence):
+    """Read-only row sequence over a ColumnTable; rows are built from the columns on access.
+
+    Renderers slice it chunk by chunk, so the whole table never exists as row lists.
+    """
+
+    def __init__(self, table: ColumnTable):
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __iter__(self) -> Iterator[List[str]]:
+        return self.table.rows()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            return list(self.table.rows(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("table row index out of range")
+        return next(self.table.rows(index, index + 1))
+
+
+def json_default(value: Any) -> Any:
+    """`default` hook for json.dumps: lazily built table rows serialize as a list."""
+    if isinstance(value, TableRows):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def read_csv_table(
+    reader: Iterator[List[str]],
+    max_rows: Optional[int] = None,
+    sample: str = "head",
+    seed: int = 0,
+) -> Tuple[Optional[ColumnTable], int, bool]:
+    """Stream rows into a ColumnTable, keeping at most `max_rows` of them.
+
+    Returns the table (None for an empty source), the number of data rows seen
+    and whether the whole source was read (head sampling stops early).
+    """
+    if max_rows is not None and max_rows < 1:
+        raise ValueError("max_rows must be at least 1")
+    if sample not in SAMPLE_MODES:
+        raise ValueError(f"sample must be one of {', '.join(SAMPLE_MODES)}")
+    rows = filter(None, reader)  # csv yields [] for blank lines
+    header = next(rows, None)
+    if header is None:
+        return None, 0, True
+
+    ahead = list(itertools.islice(rows, INFER_ROWS))
+    kinds = [infer_kind(row[idx] if idx < len(row) else "" for row in ahead) for idx in range(len(header))]
+    table = ColumnTable(header, kinds)
+    rows = itertools.chain(ahead, rows)
+    if sample == "tail" and max_rows is not None:
+        # Only the last rows survive, so hold them as text and convert them once at the end.
+        window = collections.deque(enumerate(rows), maxlen=max_rows)
+        if window:
+            table.extend(window[0][0], [row for _, row in window])
+            return table, window[-1][0] + 1, True
+        return table, 0, True
+
+    seen = 0
+    while max_rows is None or seen < max_rows:
+        size = BATCH_ROWS if max_rows is None else min(BATCH_ROWS, max_rows - seen)
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return table, seen, True
+        table.extend(seen, batch)
+        seen += len(batch)
+    if sample == "head":
+        return table, seen, next(rows, None) is None
+
+    rng = random.Random(seed)
+    for row in rows:
+        slot = rng.randrange(seen + 1)
+        if slot < max_rows:
+            table.store(slot, seen, row)
+        seen += 1
+    return table, seen, True
+
+
+@contextmanager
+def paused_gc():
+    # Millions of new row lists would otherwise trigger repeated full collections.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+@contextmanager
+def open_lines(source: str):
+    if is_url(source):
+        import requests
+
+        with requests.get(source, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            yield response.iter_lines(decode_unicode=True)
+    else:
+        with open(source, "r", encoding="utf-8", newline="") as handle:
+            yield handle
+
+
+def load_csv(source: str, max_rows: Optional[int] = None, sample: str = "head", seed: int = 0) -> Dict[str, Any]:
+    with open_lines(source) as lines, paused_gc():
+        table, seen, complete = read_csv_table(csv.reader(lines), max_rows, sample, seed)
+    if table is None:
+        return {"title": "AI Report", "table": {"columns": [], "rows": []}}
+
+    summary = "Generated from CSV source."
+    if not complete:
+        summary = f"Generated from the first {len(table):,} rows of a CSV source."
+    elif len(table) < seen:
+        kept = "last" if sample == "tail" else "a random sample of"
+        summary = f"Generated from {kept} {len(table):,} of {seen:,} rows of a CSV source."
+
+    return {
+        "title": "AI Report",
+        "summary": summary,
+        "table": {
+            "title": "Source data",
+            "columns": table.columns,
+            "rows": TableRows(table),
+        },
+    }
+
+
+def resolve_data(source: str, max_rows: Optional[int] = None, sample: str = "head", seed: int = 0) -> Dict[str, Any]:
+    if source.lower().endswith(".csv"):
+        return load_csv(source, max_rows, sample, seed)
+    return load_json(source)
+
+
+# -------------------------
+# Chart series
+# -------------------------
+
+def minmax_indices(values, buckets: int):
+    """Indices of each bucket's min and max across all rows of `values` (series x points).
+
+    Shared x labels rule out per-series LTTB, so every series keeps its extremes
+    at common indices; the first and last points are always kept.
+    """
+    import numpy as np
+
+    count = values.shape[1]
+    size = -(-count // buckets)
+    padded = np.full((values.shape[0], buckets * size), np.nan)
+    padded[:, :count] = values
+    padded = padded.reshape(values.shape[0], buckets, size)
+    base = np.arange(buckets) * size
+    low = np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=2) + base
+    high = np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=2) + base
+    keep = np.concatenate([low.ravel(), high.ravel(), [0, count - 1]])
+    return np.unique(keep[keep < count])
+
+
+def downsample_chart(chart: Dict[str, Any], width: int) -> Dict[str, Any]:
+    """Reduce a line chart to about two points per pixel column of `width`.
+
+    The reduced chart's "x" lists each kept point's index in the full series, so
+    renderers can keep the spacing. Bar charts, charts that already fit and
+    series that are not numeric or do not line up with the labels are returned
+    unchanged.
+    """
+    labels = chart.get("labels") or []
+    series = chart.get("series") or []
+    if width <= 0 or chart.get("type", "line") == "bar" or len(labels) <= 2 * width or not series:
+        return chart
+    if any(len(item.get("data") or []) != len(labels) for item in series):
+        return chart
+
+    import numpy as np
+
+    try:
+        values = np.array([item["data"] for item in series], dtype=float)
+    except (TypeError, ValueError):
+        return chart
+    keep = minmax_indices(values, width).tolist()
+    reduced = dict(chart, labels=[labels[idx] for idx in keep], x=keep)
+    reduced["series"] = [dict(item, data=[item["data"][idx] for idx in keep]) for item in series]
+    return reduced
+
+
+def downsample_charts(data: Dict[str, Any], width: int) -> Dict[str, Any]:
+    if not data.get("charts") or width <= 0:
+        return data
+    return dict(data, charts=[downsample_chart(chart, width) for chart in data["charts"]])
+
+
+# -------------------------
+# Templates
+# -------------------------
+
+def template_env(template_dir: Path, bytecode_dir: Optional[Path] = None) -> Environment:
+    """Jinja environment for the report templates; compiled templates persist in `bytecode_dir`."""
+    bytecode_cache = None
+    if bytecode_dir is not None:
+        Path(bytecode_dir).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_dir))
+    return Environment(loader=FileSystemLoader(template_dir), autoescape=True, bytecode_cache=bytecode_cache)
+
+
+def add_data_arguments(parser) -> None:
+    """CSV sampling flags shared by both renderers."""
+    parser.add_argument("--max-rows", type=int, default=None, help="Keep at most this many CSV rows.")
+    parser.add_argument(
+        "--sample",
+        choices=SAMPLE_MODES,
+        default="head",
+        help="Which rows --max-rows keeps: the first, the last or a uniform random sample.",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for --sample reservoir.")